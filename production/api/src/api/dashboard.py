@@ -155,7 +155,7 @@ async def dashboard(request: Request):
 
     try:
         r = redis.from_url(redis_url, decode_responses=True)
-        guild_keys = r.keys("discord_rag:guild:*:stats")
+        guild_keys = r.scan_iter(match="discord_rag:guild:*:stats", count=500)
         for key in guild_keys:
             guild_stats = r.hgetall(key)
             total_messages += int(guild_stats.get("total_messages", 0))
@@ -309,7 +309,7 @@ async def api_index_stats(user: str = Depends(require_auth)):
     try:
         r = redis.from_url(redis_url, decode_responses=True)
         # Find all guild stats keys
-        guild_keys = r.keys("discord_rag:guild:*:stats")
+        guild_keys = r.scan_iter(match="discord_rag:guild:*:stats", count=500)
         for key in guild_keys:
             stats = r.hgetall(key)
             total_messages += int(stats.get("total_messages", 0))
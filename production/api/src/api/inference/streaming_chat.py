@@ -8,6 +8,7 @@ import os
 import re
 import json
 import logging
+import orjson
 from datetime import datetime, timedelta
 from collections import defaultdict
 from typing import Generator, List, Dict, Any, Optional, Tuple
@@ -38,9 +39,20 @@ CONVERSATION CONTEXT:
 You are in a multi-turn conversation. Use the previous messages to understand context and avoid repeating searches you've already done."""
 
 
-def create_sse_event(event_type: str, data: Dict[str, Any]) -> str:
-    """Create a Server-Sent Event string."""
-    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+# Pre-encoded "event: <name>\ndata: " prefixes for every event type we emit
+_SSE_PREFIXES: Dict[str, bytes] = {
+    name: f"event: {name}\ndata: ".encode()
+    for name in (
+        "conversation", "thinking", "tool_call", "tool_result",
+        "content", "sources", "done", "title_update", "error",
+    )
+}
+
+
+def create_sse_event(event_type: str, data: Dict[str, Any]) -> bytes:
+    """Create a Server-Sent Event frame as bytes."""
+    prefix = _SSE_PREFIXES.get(event_type) or f"event: {event_type}\ndata: ".encode()
+    return prefix + orjson.dumps(data) + b"\n\n"
 
 
 class StreamingChatInferencer:
@@ -455,11 +467,27 @@ class StreamingChatInferencer:
         history: Optional[List[Dict[str, str]]] = None,
         max_iterations: int = 15,
         model_override: Optional[str] = None
-    ) -> Generator[str, None, None]:
+    ) -> Generator[bytes, None, None]:
         """
         Stream a chat response with chain-of-thought visibility.
 
-        Yields SSE-formatted strings for each event.
+        Yields SSE-formatted byte frames for each event.
+        """
+        for event_type, data in self.chat_events(message, history, max_iterations, model_override):
+            yield create_sse_event(event_type, data)
+
+    def chat_events(
+        self,
+        message: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        max_iterations: int = 15,
+        model_override: Optional[str] = None
+    ) -> Generator[Tuple[str, Dict[str, Any]], None, None]:
+        """
+        Run a chat turn, yielding structured (event_type, data) events.
+
+        Callers that need to inspect events should consume this rather than
+        parsing the frames produced by chat_stream.
         """
         history = history or []
         all_sources: List[tuple] = []  # List of (source_num, doc, formatted_text)
@@ -498,7 +526,7 @@ Start by analyzing the question and choosing the best tools."""
             logger.info(f"Starting streaming chat for: {message[:100]}...")
 
             # Yield thinking event
-            yield create_sse_event("thinking", {
+            yield ("thinking", {
                 "content": "Analyzing the question and planning search strategy..."
             })
 
@@ -520,7 +548,7 @@ Start by analyzing the question and choosing the best tools."""
                     has_text = any(hasattr(p, 'text') and p.text for p in response.parts)
                     if not has_text:
                         logger.warning(f"Empty response from model, no function calls or text")
-                        yield create_sse_event("thinking", {
+                        yield ("thinking", {
                             "content": "Model didn't respond, retrying with explicit instruction..."
                         })
                         response = chat.send_message(
@@ -535,7 +563,7 @@ Start by analyzing the question and choosing the best tools."""
                     args = dict(fc.args)
 
                     # Yield tool_call event with all args
-                    yield create_sse_event("tool_call", {
+                    yield ("tool_call", {
                         "tool": fc.name,
                         "args": args,
                         "iteration": iteration
@@ -556,7 +584,7 @@ Start by analyzing the question and choosing the best tools."""
                     })
 
                     # Yield tool_result event with preview
-                    yield create_sse_event("tool_result", {
+                    yield ("tool_result", {
                         "tool": fc.name,
                         "results_count": len(new_sources),
                         "preview": result_text[:500] + "..." if len(result_text) > 500 else result_text
@@ -577,7 +605,7 @@ Start by analyzing the question and choosing the best tools."""
 
                 # Send function results back
                 if function_response_parts:
-                    yield create_sse_event("thinking", {
+                    yield ("thinking", {
                         "content": f"Processing results... ({len(tool_calls_log)} tool calls so far)"
                     })
                     response = chat.send_message(function_response_parts)
@@ -592,7 +620,7 @@ Start by analyzing the question and choosing the best tools."""
             chunk_size = 50
             for i in range(0, len(final_answer), chunk_size):
                 chunk = final_answer[i:i + chunk_size]
-                yield create_sse_event("content", {"text": chunk})
+                yield ("content", {"text": chunk})
 
             # Extract which source numbers the AI actually referenced
             # Match various formats including comma-separated: [Source 1, 2, 3], (Source 1), Source 1, [1], etc.
@@ -655,10 +683,10 @@ Start by analyzing the question and choosing the best tools."""
 
             # Yield sources
             if sources:
-                yield create_sse_event("sources", {"sources": sources})
+                yield ("sources", {"sources": sources})
 
             # Yield completion event
-            yield create_sse_event("done", {
+            yield ("done", {
                 "iterations": iteration,
                 "total_docs_retrieved": len(all_sources),
                 "unique_sources_cited": len(sources),
@@ -670,7 +698,7 @@ Start by analyzing the question and choosing the best tools."""
 
         except Exception as e:
             logger.error(f"Streaming chat error: {e}", exc_info=True)
-            yield create_sse_event("error", {"message": str(e)})
+            yield ("error", {"message": str(e)})
 
 
 # Singleton instance
@@ -11,7 +11,7 @@ from contextlib import asynccontextmanager
 from dashboard import router as dashboard_router
 from v1 import router as v1_router
 from errors import APIError, api_error_handler, http_exception_handler, generic_exception_handler
-from stats import get_stats_tracker
+from stats import get_stats_tracker, flush_stats_tracker, flush_periodically
 
 # Check if platform mode is enabled
 PLATFORM_ENABLED = os.getenv("ENABLE_PLATFORM", "false").lower() == "true"
@@ -22,12 +22,19 @@ async def lifespan(app: FastAPI):
     """Application lifespan handler for startup/shutdown."""
     # Startup
     if PLATFORM_ENABLED:
-        from platform_app.database import setup_admin_user, get_database
-        # Initialize database connection and setup admin
-        await get_database()
+        from platform_app.database import setup_admin_user, migrate_database
+        # Connect, migrate stored data before serving, and setup admin
+        await migrate_database()
         await setup_admin_user()
+    stats_flusher = asyncio.create_task(flush_periodically())
     yield
-    # Shutdown (nothing to do)
+    # Shutdown: stop the periodic flush, then persist any stats still held in memory
+    stats_flusher.cancel()
+    try:
+        await stats_flusher
+    except asyncio.CancelledError:
+        pass
+    flush_stats_tracker()
 
 
 app = FastAPI(
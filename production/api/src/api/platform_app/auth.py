@@ -3,41 +3,51 @@ Authentication for platform mode.
 
 Provides session-based authentication for the platform UI.
 """
+import asyncio
 import logging
 from typing import Optional
 from fastapi import Request, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from platform_app.database import (
-    get_user_by_id,
+    get_user_auth_view,
     get_session_by_token,
+    is_valid_session_token,
     verify_password,
     create_session,
     delete_session,
     update_last_login,
     get_user_by_username,
+    change_password,
 )
-from platform_app.models import UserRole, UserStatus
+from platform_app.models import UserRole, UserStatus, UserResponse
+from platform_app.session_cache import get_cached_user, cache_user, invalidate_sessions
 
 logger = logging.getLogger(__name__)
 
+# Cookie holding the browser session token
+SESSION_COOKIE_NAME = "platform_session"
+
 # HTTP Bearer for API access
 bearer_scheme = HTTPBearer(auto_error=False)
 
 
-async def get_current_user_from_cookie(request: Request) -> Optional[dict]:
-    """Get the current user from the session cookie."""
-    session_token = request.cookies.get("platform_session")
-    if not session_token:
+async def get_user_by_session_token(token: str) -> Optional[dict]:
+    """Resolve a session token to its active user, using the session cache."""
+    if not is_valid_session_token(token):
         return None
 
-    session = await get_session_by_token(session_token)
-    if not session:
-        return None
+    user = await get_cached_user(token)
+    if user is None:
+        session = await get_session_by_token(token)
+        if not session:
+            return None
 
-    user = await get_user_by_id(session["user_id"])
-    if not user:
-        return None
+        user = await get_user_auth_view(session["user_id"])
+        if not user:
+            return None
+
+        await cache_user(token, user, session["expires_at"])
 
     if user["status"] != UserStatus.ACTIVE.value:
         return None
@@ -45,6 +55,15 @@ async def get_current_user_from_cookie(request: Request) -> Optional[dict]:
     return user
 
 
+async def get_current_user_from_cookie(request: Request) -> Optional[dict]:
+    """Get the current user from the session cookie."""
+    session_token = request.cookies.get(SESSION_COOKIE_NAME)
+    if not session_token:
+        return None
+
+    return await get_user_by_session_token(session_token)
+
+
 async def get_current_user_from_bearer(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
 ) -> Optional[dict]:
@@ -52,18 +71,7 @@ async def get_current_user_from_bearer(
     if not credentials:
         return None
 
-    session = await get_session_by_token(credentials.credentials)
-    if not session:
-        return None
-
-    user = await get_user_by_id(session["user_id"])
-    if not user:
-        return None
-
-    if user["status"] != UserStatus.ACTIVE.value:
-        return None
-
-    return user
+    return await get_user_by_session_token(credentials.credentials)
 
 
 async def get_current_user(
@@ -115,12 +123,17 @@ async def authenticate_user(username: str, password: str) -> Optional[dict]:
     if not user:
         return None
 
-    if not verify_password(password, user["password_hash"], user["password_salt"]):
+    # PBKDF2 is CPU-bound; keep it off the event loop
+    if not await asyncio.to_thread(verify_password, password, user["password_hash"], user["password_salt"]):
         return None
 
     if user["status"] != UserStatus.ACTIVE.value:
         return None
 
+    # Upgrade hashes still stored as hex strings now that we have the password
+    if isinstance(user["password_hash"], str):
+        await change_password(str(user["_id"]), password)
+
     return user
 
 
@@ -130,11 +143,13 @@ async def login_user(username: str, password: str) -> Optional[dict]:
     if not user:
         return None
 
-    # Update last login
-    await update_last_login(str(user["_id"]))
-
-    # Create session
-    session = await create_session(str(user["_id"]))
+    # Update last login and create the session concurrently; they touch
+    # different collections
+    user_id = str(user["_id"])
+    _, session = await asyncio.gather(
+        update_last_login(user_id),
+        create_session(user_id)
+    )
 
     return {
         "user": user,
@@ -143,20 +158,24 @@ async def login_user(username: str, password: str) -> Optional[dict]:
 
 
 async def logout_user(token: str) -> bool:
-    """Log out a user by deleting their session."""
-    return await delete_session(token)
-
-
-def user_to_response(user: dict) -> dict:
-    """Convert a user document to a response dict."""
-    created_at = user["created_at"]
-    last_login = user.get("last_login")
-    return {
-        "id": str(user["_id"]),
-        "username": user["username"],
-        "email": user["email"],
-        "role": user["role"],
-        "status": user["status"],
-        "created_at": created_at.isoformat() if created_at else None,
-        "last_login": last_login.isoformat() if last_login else None,
-    }
+    """Log out a user by deleting their session.
+
+    The session is removed from Mongo before the cache, so a concurrent
+    request can't re-cache it from the still-present document.
+    """
+    deleted = await delete_session(token)
+    await invalidate_sessions([token])
+    return deleted
+
+
+def user_to_response(user: dict) -> UserResponse:
+    """Convert a user document to a response model."""
+    return UserResponse(
+        id=str(user["_id"]),
+        username=user["username"],
+        email=user["email"],
+        role=user["role"],
+        status=user["status"],
+        created_at=user["created_at"],
+        last_login=user.get("last_login"),
+    )
@@ -4,15 +4,20 @@ Database operations for platform mode.
 Uses MongoDB for storing users, sessions, invite codes, and conversations.
 """
 import os
+import re
+import asyncio
 import secrets
 import hashlib
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Union
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from bson import ObjectId
+from pymongo import IndexModel, ReturnDocument
+from pymongo.errors import BulkWriteError, OperationFailure
 
 from platform_app.models import UserRole, UserStatus, MessageRole
+from platform_app.session_cache import invalidate_sessions
 
 logger = logging.getLogger(__name__)
 
@@ -22,66 +27,248 @@ MONGODB_DB = os.getenv("MONGODB_DB", "discord_rag")
 
 _client: Optional[AsyncIOMotorClient] = None
 _db: Optional[AsyncIOMotorDatabase] = None
+_index_task: Optional[asyncio.Task] = None
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Unique per-conversation message order; the conversation migration depends on it
+MESSAGE_INDEXES = [
+    IndexModel([("conversation_id", 1), ("seq", 1)], unique=True),
+]
 
 
 async def get_database() -> AsyncIOMotorDatabase:
-    """Get or create the MongoDB database connection."""
-    global _client, _db
+    """Get or create the MongoDB database connection.
+
+    Index creation runs in the background so the first request on a worker
+    doesn't wait on it.
+    """
+    global _client, _db, _index_task
     if _db is None:
         _client = AsyncIOMotorClient(MONGODB_URL)
         _db = _client[MONGODB_DB]
-        await _ensure_indexes()
+        _index_task = asyncio.create_task(_ensure_indexes())
+        _index_task.add_done_callback(_log_index_failure)
     return _db
 
 
+async def migrate_database():
+    """Bring stored data up to the current layout.
+
+    Run at startup before any request is served; a failure aborts startup
+    rather than leaving the app on half-migrated data.
+    """
+    await get_database()
+    await _migrate_conversations()
+    await _migrate_user_ids()
+
+
+def _log_index_failure(task: asyncio.Task):
+    """Surface errors from the background index task."""
+    if not task.cancelled() and task.exception():
+        logger.error("Platform database index creation failed", exc_info=task.exception())
+
+
 async def _ensure_indexes():
-    """Create database indexes for performance."""
+    """Create database indexes for performance. One round-trip per collection."""
     db = _db
 
-    # Users collection
-    await db.platform_users.create_index("username", unique=True)
-    await db.platform_users.create_index("email", unique=True)
-    await db.platform_users.create_index("status")
+    await asyncio.gather(
+        db.platform_users.create_indexes([
+            IndexModel("username", unique=True),
+            IndexModel("email", unique=True),
+            IndexModel("status"),
+            IndexModel("created_at"),
+            IndexModel([("status", 1), ("created_at", 1)]),
+        ]),
+        db.platform_sessions.create_indexes([
+            IndexModel("token", unique=True),
+            IndexModel("user_id"),
+            IndexModel("expires_at", expireAfterSeconds=0),
+        ]),
+        db.platform_invite_codes.create_indexes([
+            IndexModel("code", unique=True),
+            IndexModel("expires_at"),
+            IndexModel([("is_active", 1), ("created_at", -1)]),
+            IndexModel([("is_active", 1), ("expires_at", 1), ("current_uses", 1)]),
+        ]),
+        db.platform_conversations.create_indexes([
+            IndexModel("user_id"),
+            IndexModel([("user_id", 1), ("updated_at", -1)]),
+        ]),
+        db.platform_messages.create_indexes(MESSAGE_INDEXES),
+    )
+
+    try:
+        # Superseded by the (user_id, updated_at) index; nothing sorts on it alone
+        await db.platform_conversations.drop_index("updated_at_1")
+    except OperationFailure:
+        pass
 
-    # Sessions collection
-    await db.platform_sessions.create_index("user_id")
-    await db.platform_sessions.create_index("expires_at", expireAfterSeconds=0)
+    logger.info("Platform database indexes created")
 
-    # Invite codes collection
-    await db.platform_invite_codes.create_index("code", unique=True)
-    await db.platform_invite_codes.create_index("expires_at")
 
-    # Conversations collection
-    await db.platform_conversations.create_index("user_id")
-    await db.platform_conversations.create_index("updated_at")
+async def _migrate_conversations():
+    """Bring conversations written by older versions up to the current layout."""
+    db = _db
+
+    # Backfill the denormalized counters on conversations created before
+    # message_count and preview were maintained on write
+    result = await db.platform_conversations.update_many(
+        {"message_count": {"$exists": False}},
+        [{"$set": {
+            "message_count": {"$size": {"$ifNull": ["$messages", []]}},
+            "preview": {"$substrCP": [
+                {"$ifNull": [{"$arrayElemAt": ["$messages.content", 0]}, ""]},
+                0,
+                CONVERSATION_PREVIEW_LENGTH
+            ]}
+        }}]
+    )
+    if result.modified_count:
+        logger.info(f"Backfilled message counts on {result.modified_count} conversations")
+
+    # Move messages embedded in the conversation document into platform_messages
+    migrated = 0
+    cursor = db.platform_conversations.find(
+        {"messages": {"$exists": True}},
+        projection={"user_id": 1, "messages": 1}
+    )
+    async for conversation in cursor:
+        if not migrated:
+            # Re-runs rely on the unique index to reject already-moved messages
+            await db.platform_messages.create_indexes(MESSAGE_INDEXES)
+        messages = [{
+            **message,
+            "conversation_id": conversation["_id"],
+            "user_id": conversation["user_id"],
+            "seq": seq,
+        } for seq, message in enumerate(conversation["messages"])]
+        if messages and not await _move_messages(conversation["_id"], messages):
+            # Keep the embedded copy; dropping it would lose the messages
+            continue
+        await db.platform_conversations.update_one(
+            {"_id": conversation["_id"]},
+            {"$unset": {"messages": ""}}
+        )
+        migrated += 1
+    if migrated:
+        logger.info(f"Moved embedded messages out of {migrated} conversations")
 
-    logger.info("Platform database indexes created")
 
+async def _move_messages(conversation_id: ObjectId, messages: List[Dict[str, Any]]) -> bool:
+    """Insert a conversation's embedded messages into platform_messages.
 
-def hash_password(password: str, salt: Optional[str] = None) -> tuple[str, str]:
-    """Hash a password with a salt. Returns (hash, salt)."""
+    Returns True once every message is stored at its seq. Duplicates left by
+    an earlier partial run are accepted only if they hold the same message.
+    """
+    db = _db
+    try:
+        await db.platform_messages.insert_many(messages, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error["code"] != DUPLICATE_KEY_ERROR for error in errors):
+            raise
+        duplicates = [messages[error["index"]] for error in errors]
+        stored = {
+            doc["seq"]: doc async for doc in db.platform_messages.find(
+                {"conversation_id": conversation_id, "seq": {"$in": [m["seq"] for m in duplicates]}}
+            )
+        }
+        for message in duplicates:
+            existing = stored.get(message["seq"], {})
+            if any(existing.get(key) != value for key, value in message.items() if key != "_id"):
+                logger.error(
+                    f"Conversation {conversation_id}: seq {message['seq']} is taken by a different "
+                    "message; leaving its embedded messages in place"
+                )
+                return False
+
+    moved = await db.platform_messages.count_documents(
+        {"conversation_id": conversation_id, "seq": {"$lt": len(messages)}}
+    )
+    if moved != len(messages):
+        logger.error(
+            f"Conversation {conversation_id}: {moved} of {len(messages)} messages moved; "
+            "leaving its embedded messages in place"
+        )
+        return False
+    return True
+
+
+async def _migrate_user_ids():
+    """Convert user_id references stored as hex strings to ObjectIds."""
+    db = _db
+    for collection in (db.platform_sessions, db.platform_conversations, db.platform_messages):
+        result = await collection.update_many(
+            {"user_id": {"$type": "string"}},
+            [{"$set": {"user_id": {"$toObjectId": "$user_id"}}}]
+        )
+        if result.modified_count:
+            logger.info(f"Converted user_id to ObjectId on {result.modified_count} {collection.name} documents")
+
+
+def _oid(value: Union[str, ObjectId]) -> ObjectId:
+    """Coerce an id to an ObjectId, skipping the parse when it already is one."""
+    return value if isinstance(value, ObjectId) else ObjectId(value)
+
+
+# PBKDF2-HMAC-SHA256 work factor. hashlib delegates to OpenSSL, which uses the
+# CPU's SHA extensions where available.
+PASSWORD_HASH_ITERATIONS = 100000
+PASSWORD_HASH_LENGTH = 32
+PASSWORD_HASH_HEX_LENGTH = 64
+
+
+def hash_password(password: str, salt: Optional[bytes] = None) -> tuple[bytes, bytes]:
+    """Hash a password with a salt. Returns raw (hash, salt) bytes."""
     if salt is None:
-        salt = secrets.token_hex(32)
+        salt = secrets.token_bytes(32)
     password_hash = hashlib.pbkdf2_hmac(
         'sha256',
         password.encode('utf-8'),
-        salt.encode('utf-8'),
-        100000
-    ).hex()
+        salt,
+        PASSWORD_HASH_ITERATIONS
+    )
     return password_hash, salt
 
 
-def verify_password(password: str, password_hash: str, salt: str) -> bool:
-    """Verify a password against a hash."""
+def verify_password(password: str, password_hash: Union[bytes, str], salt: Union[bytes, str]) -> bool:
+    """Verify a password against a hash.
+
+    Accepts the hex strings written by older versions as well as raw bytes.
+    """
+    if isinstance(password_hash, str):
+        if len(password_hash) != PASSWORD_HASH_HEX_LENGTH:
+            return False
+        try:
+            password_hash = bytes.fromhex(password_hash)
+        except ValueError:
+            return False
+    if isinstance(salt, str):
+        # Legacy salts are hex text that was fed to the KDF as-is
+        salt = salt.encode('utf-8')
+    # A malformed stored hash can never match; skip the key derivation
+    if not password_hash or len(password_hash) != PASSWORD_HASH_LENGTH:
+        return False
     computed_hash, _ = hash_password(password, salt)
     return secrets.compare_digest(computed_hash, password_hash)
 
 
+# Shape of tokens from generate_session_token (64 chars), with some slack
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_\-]{43,86}")
+
+
 def generate_session_token() -> str:
     """Generate a secure session token."""
     return secrets.token_urlsafe(48)
 
 
+def is_valid_session_token(token: str) -> bool:
+    """Check a token's shape so malformed ones never reach the database."""
+    return bool(token) and _TOKEN_RE.fullmatch(token) is not None
+
+
 def generate_invite_code() -> str:
     """Generate a unique invite code."""
     return secrets.token_urlsafe(12).replace("-", "").replace("_", "")[:16].upper()
@@ -94,12 +281,13 @@ async def create_user(
     email: str,
     password: str,
     role: UserRole = UserRole.USER,
-    invite_code_used: Optional[str] = None
+    invite_code_used: Optional[str] = None,
+    user_id: Optional[ObjectId] = None
 ) -> Dict[str, Any]:
-    """Create a new user."""
+    """Create a new user. Pass user_id to use a pre-allocated ObjectId."""
     db = await get_database()
 
-    password_hash, salt = hash_password(password)
+    password_hash, salt = await asyncio.to_thread(hash_password, password)
 
     user_doc = {
         "username": username.lower(),
@@ -112,16 +300,39 @@ async def create_user(
         "last_login": None,
         "invite_code_used": invite_code_used,
     }
+    if user_id is not None:
+        user_doc["_id"] = user_id
 
     result = await db.platform_users.insert_one(user_doc)
     user_doc["_id"] = result.inserted_id
     return user_doc
 
 
-async def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
+async def get_user_by_id(user_id: Union[str, ObjectId]) -> Optional[Dict[str, Any]]:
     """Get a user by ID."""
     db = await get_database()
-    return await db.platform_users.find_one({"_id": ObjectId(user_id)})
+    return await db.platform_users.find_one({"_id": _oid(user_id)})
+
+
+# Fields request authentication needs; leaves out the password hash and salt
+USER_AUTH_PROJECTION = {
+    "_id": 1,
+    "username": 1,
+    "email": 1,
+    "role": 1,
+    "status": 1,
+    "created_at": 1,
+    "last_login": 1,
+}
+
+
+async def get_user_auth_view(user_id: Union[str, ObjectId]) -> Optional[Dict[str, Any]]:
+    """Get the subset of a user needed to authenticate requests."""
+    db = await get_database()
+    return await db.platform_users.find_one(
+        {"_id": _oid(user_id)},
+        projection=USER_AUTH_PROJECTION
+    )
 
 
 async def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
@@ -140,9 +351,10 @@ async def update_user(user_id: str, updates: Dict[str, Any]) -> bool:
     """Update a user."""
     db = await get_database()
     result = await db.platform_users.update_one(
-        {"_id": ObjectId(user_id)},
+        {"_id": _oid(user_id)},
         {"$set": updates}
     )
+    await _invalidate_user_session_cache(user_id)
     return result.modified_count > 0
 
 
@@ -150,27 +362,27 @@ async def update_last_login(user_id: str):
     """Update the last login time for a user."""
     db = await get_database()
     await db.platform_users.update_one(
-        {"_id": ObjectId(user_id)},
+        {"_id": _oid(user_id)},
         {"$set": {"last_login": datetime.utcnow()}}
     )
 
 
 async def change_password(user_id: str, new_password: str) -> bool:
     """Change a user's password."""
-    password_hash, salt = hash_password(new_password)
+    password_hash, salt = await asyncio.to_thread(hash_password, new_password)
     return await update_user(user_id, {
         "password_hash": password_hash,
         "password_salt": salt
     })
 
 
-async def list_users(
+async def iter_users(
     skip: int = 0,
     limit: int = 50,
     role: Optional[UserRole] = None,
     status: Optional[UserStatus] = None
-) -> List[Dict[str, Any]]:
-    """List users with optional filtering."""
+) -> AsyncIterator[Dict[str, Any]]:
+    """Iterate users with optional filtering, without materializing the page."""
     db = await get_database()
 
     query = {}
@@ -180,7 +392,8 @@ async def list_users(
         query["status"] = status.value
 
     cursor = db.platform_users.find(query).skip(skip).limit(limit).sort("created_at", -1)
-    return await cursor.to_list(length=limit)
+    async for user in cursor:
+        yield user
 
 
 async def count_users(
@@ -202,17 +415,45 @@ async def count_users(
     return await db.platform_users.count_documents(query)
 
 
+async def count_users_facets(today: datetime, week_ago: datetime) -> Dict[str, int]:
+    """Count users by status and registration date in a single aggregation.
+
+    Returns a dict with keys total, active, suspended, today and week.
+    """
+    db = await get_database()
+
+    def _count(match: Optional[dict] = None) -> List[dict]:
+        return ([{"$match": match}] if match else []) + [{"$count": "n"}]
+
+    pipeline = [{"$facet": {
+        "total": _count(),
+        "active": _count({"status": UserStatus.ACTIVE.value}),
+        "suspended": _count({"status": UserStatus.SUSPENDED.value}),
+        "today": _count({"created_at": {"$gte": today}}),
+        "week": _count({"created_at": {"$gte": week_ago}}),
+    }}]
+
+    result = await db.platform_users.aggregate(pipeline).to_list(1)
+    facets = result[0] if result else {}
+    # An empty facet yields [] rather than [{"n": 0}]
+    return {
+        name: (facets.get(name) or [{"n": 0}])[0]["n"]
+        for name in ("total", "active", "suspended", "today", "week")
+    }
+
+
 # ============== Session Operations ==============
 
 async def create_session(user_id: str, expires_hours: int = 24 * 7) -> Dict[str, Any]:
     """Create a new session for a user."""
     db = await get_database()
 
+    now = datetime.utcnow()
     session_doc = {
-        "user_id": user_id,
+        "user_id": _oid(user_id),
         "token": generate_session_token(),
-        "created_at": datetime.utcnow(),
-        "expires_at": datetime.utcnow() + timedelta(hours=expires_hours),
+        "created_at": now,
+        "expires_at": now + timedelta(hours=expires_hours),
     }
 
     result = await db.platform_sessions.insert_one(session_doc)
@@ -222,30 +463,72 @@ async def create_session(user_id: str, expires_hours: int = 24 * 7) -> Dict[str,
 
 async def get_session_by_token(token: str) -> Optional[Dict[str, Any]]:
     """Get a session by token."""
+    if not is_valid_session_token(token):
+        return None
     db = await get_database()
-    session = await db.platform_sessions.find_one({
-        "token": token,
-        "expires_at": {"$gt": datetime.utcnow()}
-    })
+    session = await db.platform_sessions.find_one(
+        {
+            "token": token,
+            "expires_at": {"$gt": datetime.utcnow()}
+        },
+        projection={"user_id": 1, "expires_at": 1}
+    )
     return session
 
 
 async def delete_session(token: str) -> bool:
     """Delete a session."""
+    if not is_valid_session_token(token):
+        return False
     db = await get_database()
     result = await db.platform_sessions.delete_one({"token": token})
     return result.deleted_count > 0
 
 
 async def delete_user_sessions(user_id: str) -> int:
-    """Delete all sessions for a user."""
+    """Delete all sessions for a user.
+
+    Mongo goes first and the cache second; the other order lets a request in
+    between re-cache a session that is about to be revoked.
+    """
     db = await get_database()
-    result = await db.platform_sessions.delete_many({"user_id": user_id})
+    cursor = db.platform_sessions.find({"user_id": _oid(user_id)}, {"token": 1, "_id": 0})
+    tokens = [s["token"] async for s in cursor]
+    result = await db.platform_sessions.delete_many({"user_id": _oid(user_id)})
+    await invalidate_sessions(tokens)
     return result.deleted_count
 
 
+async def _invalidate_user_session_cache(user_id: str):
+    """Drop cached lookups for every session belonging to a user."""
+    db = await get_database()
+    cursor = db.platform_sessions.find({"user_id": _oid(user_id)}, {"token": 1, "_id": 0})
+    await invalidate_sessions([s["token"] async for s in cursor])
+
+
 # ============== Invite Code Operations ==============
 
+def _new_invite_code_doc(
+    created_by: str,
+    max_uses: int,
+    expires_at: Optional[datetime],
+    note: Optional[str],
+    now: datetime
+) -> Dict[str, Any]:
+    """Build an unsaved invite code document."""
+    return {
+        "code": generate_invite_code(),
+        "created_by": created_by,
+        "created_at": now,
+        "expires_at": expires_at,
+        "max_uses": max_uses,
+        "current_uses": 0,
+        "used_by": [],
+        "note": note,
+        "is_active": True,
+    }
+
+
 async def create_invite_code(
     created_by: str,
     max_uses: int = 1,
@@ -255,27 +538,50 @@ async def create_invite_code(
     """Create a new invite code."""
     db = await get_database()
 
+    now = datetime.utcnow()
     expires_at = None
     if expires_in_days:
-        expires_at = datetime.utcnow() + timedelta(days=expires_in_days)
+        expires_at = now + timedelta(days=expires_in_days)
 
-    code_doc = {
-        "code": generate_invite_code(),
-        "created_by": created_by,
-        "created_at": datetime.utcnow(),
-        "expires_at": expires_at,
-        "max_uses": max_uses,
-        "current_uses": 0,
-        "used_by": [],
-        "note": note,
-        "is_active": True,
-    }
+    code_doc = _new_invite_code_doc(created_by, max_uses, expires_at, note, now)
 
     result = await db.platform_invite_codes.insert_one(code_doc)
     code_doc["_id"] = result.inserted_id
     return code_doc
 
 
+async def create_invite_codes_bulk(
+    created_by: str,
+    count: int,
+    max_uses: int = 1,
+    expires_in_days: Optional[int] = 7,
+    note: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Create several invite codes in one round-trip.
+
+    The insert is unordered, so a rare duplicate code only drops that one
+    document; the returned list holds the codes that were actually stored.
+    """
+    db = await get_database()
+
+    now = datetime.utcnow()
+    expires_at = None
+    if expires_in_days:
+        expires_at = now + timedelta(days=expires_in_days)
+
+    code_docs = [
+        _new_invite_code_doc(created_by, max_uses, expires_at, note, now)
+        for _ in range(count)
+    ]
+
+    try:
+        await db.platform_invite_codes.insert_many(code_docs, ordered=False)
+    except BulkWriteError as e:
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+        code_docs = [doc for i, doc in enumerate(code_docs) if i not in failed]
+    return code_docs
+
+
 async def get_invite_code(code: str) -> Optional[Dict[str, Any]]:
     """Get an invite code."""
     db = await get_database()
@@ -283,27 +589,43 @@ async def get_invite_code(code: str) -> Optional[Dict[str, Any]]:
 
 
 async def use_invite_code(code: str, user_id: str) -> bool:
-    """Mark an invite code as used by a user."""
-    db = await get_database()
+    """Redeem an invite code for a user.
 
-    invite = await get_invite_code(code)
-    if not invite:
-        return False
-
-    if not invite["is_active"]:
-        return False
+    The validity checks and the use-count increment happen in a single
+    find_one_and_update, so concurrent redemptions can't exceed max_uses.
+    Returns False if the code is invalid, inactive, expired or used up;
+    call validate_invite_code to find out which.
+    """
+    db = await get_database()
+    now = datetime.utcnow()
 
-    if invite["expires_at"] and invite["expires_at"] < datetime.utcnow():
-        return False
+    invite = await db.platform_invite_codes.find_one_and_update(
+        {
+            "code": code.upper(),
+            "is_active": True,
+            "$or": [
+                {"expires_at": None},
+                {"expires_at": {"$gt": now}}
+            ],
+            "$expr": {"$lt": ["$current_uses", "$max_uses"]}
+        },
+        {
+            "$inc": {"current_uses": 1},
+            "$push": {"used_by": {"user_id": user_id, "used_at": now}}
+        },
+        projection={"_id": 1}
+    )
+    return invite is not None
 
-    if invite["current_uses"] >= invite["max_uses"]:
-        return False
 
+async def release_invite_code(code: str, user_id: str) -> bool:
+    """Undo a redemption made by use_invite_code."""
+    db = await get_database()
     result = await db.platform_invite_codes.update_one(
-        {"code": code.upper()},
+        {"code": code.upper(), "used_by.user_id": user_id},
         {
-            "$inc": {"current_uses": 1},
-            "$push": {"used_by": {"user_id": user_id, "used_at": datetime.utcnow()}}
+            "$inc": {"current_uses": -1},
+            "$pull": {"used_by": {"user_id": user_id}}
         }
     )
     return result.modified_count > 0
@@ -338,13 +660,13 @@ async def deactivate_invite_code(code: str) -> bool:
     return result.modified_count > 0
 
 
-async def list_invite_codes(
+async def iter_invite_codes(
     created_by: Optional[str] = None,
     active_only: bool = False,
     skip: int = 0,
     limit: int = 50
-) -> List[Dict[str, Any]]:
-    """List invite codes."""
+) -> AsyncIterator[Dict[str, Any]]:
+    """Iterate invite codes without materializing the page."""
     db = await get_database()
 
     query = {}
@@ -359,7 +681,8 @@ async def list_invite_codes(
         query["$expr"] = {"$lt": ["$current_uses", "$max_uses"]}
 
     cursor = db.platform_invite_codes.find(query).skip(skip).limit(limit).sort("created_at", -1)
-    return await cursor.to_list(length=limit)
+    async for code in cursor:
+        yield code
 
 
 async def count_active_invite_codes() -> int:
@@ -376,6 +699,9 @@ async def count_active_invite_codes() -> int:
 
 # ============== Conversation Operations ==============
 
+# Length of the first-message snippet stored on each conversation
+CONVERSATION_PREVIEW_LENGTH = 100
+
 async def create_conversation(
     user_id: str,
     title: Optional[str] = None
@@ -383,12 +709,14 @@ async def create_conversation(
     """Create a new conversation."""
     db = await get_database()
 
+    now = datetime.utcnow()
     conversation_doc = {
-        "user_id": user_id,
+        "user_id": _oid(user_id),
         "title": title or "New Conversation",
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow(),
-        "messages": [],
+        "created_at": now,
+        "updated_at": now,
+        "message_count": 0,
+        "preview": None,
     }
 
     result = await db.platform_conversations.insert_one(conversation_doc)
@@ -397,12 +725,15 @@ async def create_conversation(
 
 
 async def get_conversation(conversation_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
-    """Get a conversation by ID. Optionally verify user ownership."""
+    """Get a conversation by ID. Optionally verify user ownership.
+
+    Messages are stored separately; see get_conversation_messages.
+    """
     db = await get_database()
 
     query = {"_id": ObjectId(conversation_id)}
     if user_id:
-        query["user_id"] = user_id
+        query["user_id"] = _oid(user_id)
 
     return await db.platform_conversations.find_one(query)
 
@@ -412,7 +743,7 @@ async def update_conversation(conversation_id: str, user_id: str, updates: Dict[
     db = await get_database()
     updates["updated_at"] = datetime.utcnow()
     result = await db.platform_conversations.update_one(
-        {"_id": ObjectId(conversation_id), "user_id": user_id},
+        {"_id": ObjectId(conversation_id), "user_id": _oid(user_id)},
         {"$set": updates}
     )
     return result.modified_count > 0
@@ -423,9 +754,27 @@ async def delete_conversation(conversation_id: str, user_id: str) -> bool:
     db = await get_database()
     result = await db.platform_conversations.delete_one({
         "_id": ObjectId(conversation_id),
-        "user_id": user_id
+        "user_id": _oid(user_id)
     })
-    return result.deleted_count > 0
+    if result.deleted_count == 0:
+        return False
+    await db.platform_messages.delete_many({"conversation_id": ObjectId(conversation_id)})
+    return True
+
+
+async def get_conversation_messages(
+    conversation_id: str,
+    skip: int = 0,
+    limit: int = 0,
+    projection: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Get a conversation's messages in order. A limit of 0 returns them all."""
+    db = await get_database()
+    cursor = db.platform_messages.find(
+        {"conversation_id": ObjectId(conversation_id)},
+        projection=projection
+    ).sort("seq", 1).skip(skip).limit(limit)
+    return await cursor.to_list(length=limit or None)
 
 
 async def add_message_to_conversation(
@@ -437,26 +786,47 @@ async def add_message_to_conversation(
     sources: Optional[List[dict]] = None,
     metadata: Optional[dict] = None
 ) -> bool:
-    """Add a message to a conversation."""
+    """Add a message to a conversation.
+
+    The conversation's message_count doubles as the sequence allocator:
+    incrementing it reserves the message's seq, so appends stay O(1) no
+    matter how long the history is.
+    """
     db = await get_database()
+    now = datetime.utcnow()
+
+    # Returns the document as it was before the increment
+    conversation = await db.platform_conversations.find_one_and_update(
+        {"_id": ObjectId(conversation_id), "user_id": _oid(user_id)},
+        {
+            "$inc": {"message_count": 1},
+            "$set": {"updated_at": now}
+        },
+        projection={"message_count": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if conversation is None:
+        return False
 
-    message = {
+    seq = conversation.get("message_count", 0)
+    await db.platform_messages.insert_one({
+        "conversation_id": conversation["_id"],
+        "user_id": _oid(user_id),
+        "seq": seq,
         "role": role.value,
         "content": content,
-        "timestamp": datetime.utcnow(),
+        "timestamp": now,
         "thinking": thinking,
         "sources": sources,
         "metadata": metadata,
-    }
+    })
 
-    result = await db.platform_conversations.update_one(
-        {"_id": ObjectId(conversation_id), "user_id": user_id},
-        {
-            "$push": {"messages": message},
-            "$set": {"updated_at": datetime.utcnow()}
-        }
-    )
-    return result.modified_count > 0
+    if seq == 0:
+        await db.platform_conversations.update_one(
+            {"_id": conversation["_id"]},
+            {"$set": {"preview": content[:CONVERSATION_PREVIEW_LENGTH]}}
+        )
+    return True
 
 
 async def list_conversations(
@@ -467,23 +837,18 @@ async def list_conversations(
     """List conversations for a user."""
     db = await get_database()
 
-    pipeline = [
-        {"$match": {"user_id": user_id}},
-        {"$sort": {"updated_at": -1}},
-        {"$skip": skip},
-        {"$limit": limit},
-        {"$project": {
+    cursor = db.platform_conversations.find(
+        {"user_id": _oid(user_id)},
+        projection={
             "_id": 1,
             "user_id": 1,
             "title": 1,
             "created_at": 1,
             "updated_at": 1,
-            "message_count": {"$size": "$messages"},
-            "preview": {"$arrayElemAt": ["$messages.content", 0]}
-        }}
-    ]
-
-    cursor = db.platform_conversations.aggregate(pipeline)
+            "message_count": 1,
+            "preview": 1
+        }
+    ).sort("updated_at", -1).skip(skip).limit(limit)
     return await cursor.to_list(length=limit)
 
 
@@ -492,7 +857,7 @@ async def count_conversations(user_id: Optional[str] = None) -> int:
     db = await get_database()
     query = {}
     if user_id:
-        query["user_id"] = user_id
+        query["user_id"] = _oid(user_id)
     return await db.platform_conversations.count_documents(query)
 
 
@@ -500,30 +865,19 @@ async def count_messages() -> int:
     """Count total messages across all conversations."""
     db = await get_database()
     pipeline = [
-        {"$project": {"message_count": {"$size": "$messages"}}},
         {"$group": {"_id": None, "total": {"$sum": "$message_count"}}}
     ]
     result = await db.platform_conversations.aggregate(pipeline).to_list(1)
     return result[0]["total"] if result else 0
 
 
-async def generate_conversation_title(conversation_id: str, user_id: str) -> str:
-    """Generate a title from the first user message."""
-    conversation = await get_conversation(conversation_id, user_id)
-    if not conversation or not conversation.get("messages"):
-        return "New Conversation"
-
-    # Find first user message
-    for msg in conversation["messages"]:
-        if msg["role"] == "user":
-            content = msg["content"]
-            # Truncate and clean up
-            title = content[:50].strip()
-            if len(content) > 50:
-                title += "..."
-            return title
-
-    return "New Conversation"
+def conversation_title_from_message(content: str) -> str:
+    """Derive a conversation title from a user message."""
+    # Truncate and clean up
+    title = content[:50].strip()
+    if len(content) > 50:
+        title += "..."
+    return title
 
 
 # ============== Admin Setup ==============
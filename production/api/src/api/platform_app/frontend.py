@@ -8,10 +8,16 @@ Provides a modern chat interface with:
 - Admin dashboard
 """
 import os
-from fastapi import APIRouter, Request, Depends
+import re
+import gzip
+import hashlib
+from functools import lru_cache
+
+import orjson
+from fastapi import APIRouter, Request, Response, HTTPException, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
 
-from platform_app.auth import get_current_user, require_user, require_admin
+from platform_app.auth import get_current_user, require_user, require_admin, SESSION_COOKIE_NAME
 
 router = APIRouter(tags=["platform-ui"])
 
@@ -19,49 +25,101 @@ router = APIRouter(tags=["platform-ui"])
 APP_NAME = os.getenv("PLATFORM_APP_NAME", "Discord RAG Chat")
 
 
-def render_page(title: str, content: str, include_chat_js: bool = False) -> str:
-    """Render a full HTML page with common styles."""
-    chat_js = CHAT_JS if include_chat_js else ""
-    # Include marked.js for markdown rendering in chat pages
-    marked_script = '<script src="https://cdn.jsdelivr.net/npm/marked/marked.min.js"></script>' if include_chat_js else ""
-    return f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title} - {APP_NAME}</title>
-    <style>{BASE_STYLES}</style>
-    {marked_script}
-</head>
-<body>
-    {content}
-    {chat_js}
-</body>
-</html>"""
+def render_page_plain(title: str, content: str, head: bytes) -> bytes:
+    """Render a full HTML page; head closes the title and links the page's stylesheet."""
+    return b"".join((_PAGE_HEAD, title.encode("utf-8"), head, content.encode("utf-8"), _PAGE_TAIL_PLAIN))
+
+
+# Per-user pages must never be cached
+_HTML_HEADERS_NO_STORE = {"Content-Type": "text/html; charset=utf-8", "Cache-Control": "no-store"}
+
+# Cache policies for pages shared by every visitor or every admin. Gated pages
+# are always revalidated (a cheap 304 via the ETag) so every load passes the
+# route's auth and role checks.
+CACHE_PUBLIC = "public, max-age=60"
+CACHE_PRIVATE = "private, no-cache"
+
+
+def html_response(body: bytes) -> Response:
+    """Wrap an already-encoded, per-user HTML page in a response."""
+    return Response(content=body, headers=_HTML_HEADERS_NO_STORE)
+
+
+def precompress(
+    body: bytes, cache_control: str, media_type: str = "text/html; charset=utf-8"
+) -> tuple[tuple[bytes, dict], tuple[bytes, dict]]:
+    """Prepare the identity and gzip variants of a shared response with their headers.
+
+    Each variant gets its own ETag so a cached gzip body is never revalidated
+    against the identity one.
+    """
+    etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+    headers = {"Content-Type": media_type, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    return (
+        (body, {**headers, "ETag": f'"{etag}"'}),
+        (gzip.compress(body, 9, mtime=0), {**headers, "ETag": f'"{etag}-gz"', "Content-Encoding": "gzip"}),
+    )
+
+
+def cached_response(request: Request, page: tuple[tuple[bytes, dict], tuple[bytes, dict]]) -> Response:
+    """Serve a precompressed response, gzipped when accepted and 304 when unchanged."""
+    body, headers = page["gzip" in request.headers.get("accept-encoding", "")]
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, headers=headers)
 
 
 # ============== Routes ==============
 
+@router.get("/static/{filename}", include_in_schema=False)
+async def static_asset(request: Request, filename: str):
+    """Serve a content-hashed stylesheet or script."""
+    asset = _STATIC_ASSETS.get(filename)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return cached_response(request, asset)
+
+
 @router.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     """Main page - redirect to chat or login."""
-    user = await get_current_user(request, None)
-    if user:
+    # Anonymous visitors have no session cookie; don't look anything up for them
+    if SESSION_COOKIE_NAME in request.cookies and await get_current_user(request, None):
         return RedirectResponse(url="/chat", status_code=302)
     return RedirectResponse(url="/login", status_code=302)
 
 
-@router.get("/login", response_class=HTMLResponse)
-async def login_page(request: Request, error: str = "", registered: str = ""):
-    """Login page."""
-    user = await get_current_user(request, None)
-    if user:
-        return RedirectResponse(url="/chat", status_code=302)
+# Alert fragments for the error codes the auth pages are linked with
+_ERROR_FRAGMENTS = {
+    code: f'<div class="alert alert-error">{message}</div>'
+    for code, message in {
+        "invalid": "Invalid username or password",
+        "expired": "Your session has expired. Please sign in again.",
+        "invite": "Invalid or expired invite code",
+        "unknown": "Something went wrong. Please try again.",
+    }.items()
+}
+_REGISTERED_FRAGMENT = '<div class="alert alert-success">Account created! Please log in.</div>'
+
+
+def _error_code(error: str) -> str:
+    """Reduce the ?error= query value to a known code.
 
-    error_html = f'<div class="alert alert-error">{error}</div>' if error else ""
-    success_html = f'<div class="alert alert-success">Account created! Please log in.</div>' if registered else ""
+    The auth pages are cached per code, so free-form values must never reach
+    the cache key or be echoed back into a publicly cacheable page.
+    """
+    if not error:
+        return ""
+    return error if error in _ERROR_FRAGMENTS else "unknown"
 
-    return HTMLResponse(render_page("Login", f"""
+
+def _error_fragment(code: str) -> str:
+    """Look up the alert for a known error code."""
+    return _ERROR_FRAGMENTS.get(code, "")
+
+
+# Login page body, split around the alert slots
+_LOGIN_BODY_PRE = f"""
     <div class="auth-container">
         <div class="auth-card">
             <div class="auth-header">
@@ -69,8 +127,8 @@ async def login_page(request: Request, error: str = "", registered: str = ""):
                 <h1>{APP_NAME}</h1>
                 <p>Sign in to continue</p>
             </div>
-            {error_html}
-            {success_html}
+            """
+_LOGIN_BODY_POST = """
             <form id="loginForm" class="auth-form">
                 <div class="form-group">
                     <label for="username">Username</label>
@@ -87,51 +145,27 @@ async def login_page(request: Request, error: str = "", registered: str = ""):
             </div>
         </div>
     </div>
-    <script>
-        document.getElementById('loginForm').addEventListener('submit', async (e) => {{
-            e.preventDefault();
-            const btn = e.target.querySelector('button');
-            btn.disabled = true;
-            btn.textContent = 'Signing in...';
-
-            try {{
-                const res = await fetch('/platform/auth/login', {{
-                    method: 'POST',
-                    headers: {{'Content-Type': 'application/json'}},
-                    body: JSON.stringify({{
-                        username: document.getElementById('username').value,
-                        password: document.getElementById('password').value
-                    }})
-                }});
-
-                if (res.ok) {{
-                    window.location.href = '/chat';
-                }} else {{
-                    const data = await res.json();
-                    alert(data.detail || 'Login failed');
-                    btn.disabled = false;
-                    btn.textContent = 'Sign In';
-                }}
-            }} catch (err) {{
-                alert('Network error');
-                btn.disabled = false;
-                btn.textContent = 'Sign In';
-            }}
-        }});
-    </script>
-    """))
+    """
 
 
-@router.get("/register", response_class=HTMLResponse)
-async def register_page(request: Request, error: str = ""):
-    """Registration page."""
-    user = await get_current_user(request, None)
-    if user:
+@lru_cache(maxsize=16)
+def _render_login(error_code: str, registered: bool) -> tuple:
+    """Render and compress the login page; identical for every anonymous visitor."""
+    success_html = _REGISTERED_FRAGMENT if registered else ""
+    return precompress(render_page_plain("Login", "".join((_LOGIN_BODY_PRE, _error_fragment(error_code), success_html, _LOGIN_BODY_POST, _AUTH_SCRIPT)), _PAGE_HEAD_AUTH), CACHE_PUBLIC)
+
+
+@router.get("/login", response_class=HTMLResponse)
+async def login_page(request: Request, error: str = "", registered: str = ""):
+    """Login page."""
+    if SESSION_COOKIE_NAME in request.cookies and await get_current_user(request, None):
         return RedirectResponse(url="/chat", status_code=302)
 
-    error_html = f'<div class="alert alert-error">{error}</div>' if error else ""
+    return cached_response(request, _render_login(_error_code(error), bool(registered)))
 
-    return HTMLResponse(render_page("Register", f"""
+
+# Register page body, split around the alert slot
+_REGISTER_BODY_PRE = f"""
     <div class="auth-container">
         <div class="auth-card">
             <div class="auth-header">
@@ -139,7 +173,8 @@ async def register_page(request: Request, error: str = ""):
                 <h1>Join {APP_NAME}</h1>
                 <p>Create your account</p>
             </div>
-            {error_html}
+            """
+_REGISTER_BODY_POST = """
             <form id="registerForm" class="auth-form">
                 <div class="form-group">
                     <label for="invite_code">Invite Code</label>
@@ -165,55 +200,26 @@ async def register_page(request: Request, error: str = ""):
             </div>
         </div>
     </div>
-    <script>
-        document.getElementById('registerForm').addEventListener('submit', async (e) => {{
-            e.preventDefault();
-            const btn = e.target.querySelector('button');
-            btn.disabled = true;
-            btn.textContent = 'Creating account...';
-
-            try {{
-                const res = await fetch('/platform/auth/register', {{
-                    method: 'POST',
-                    headers: {{'Content-Type': 'application/json'}},
-                    body: JSON.stringify({{
-                        invite_code: document.getElementById('invite_code').value,
-                        username: document.getElementById('username').value,
-                        email: document.getElementById('email').value,
-                        password: document.getElementById('password').value
-                    }})
-                }});
-
-                if (res.ok) {{
-                    window.location.href = '/chat';
-                }} else {{
-                    const data = await res.json();
-                    alert(data.detail || 'Registration failed');
-                    btn.disabled = false;
-                    btn.textContent = 'Create Account';
-                }}
-            }} catch (err) {{
-                alert('Network error');
-                btn.disabled = false;
-                btn.textContent = 'Create Account';
-            }}
-        }});
-    </script>
-    """))
-
-
-@router.get("/chat", response_class=HTMLResponse)
-@router.get("/chat/{conversation_id}", response_class=HTMLResponse)
-async def chat_page(request: Request, conversation_id: str = None):
-    """Main chat interface."""
-    user = await get_current_user(request, None)
-    if not user:
-        return RedirectResponse(url="/login", status_code=302)
+    """
+
 
-    is_admin = user.get("role") == "admin"
-    admin_link = '<a href="/admin" class="sidebar-link">Admin</a>' if is_admin else ""
+@lru_cache(maxsize=8)
+def _render_register(error_code: str) -> tuple:
+    """Render and compress the registration page; identical for every anonymous visitor."""
+    return precompress(render_page_plain("Register", "".join((_REGISTER_BODY_PRE, _error_fragment(error_code), _REGISTER_BODY_POST, _AUTH_SCRIPT)), _PAGE_HEAD_AUTH), CACHE_PUBLIC)
 
-    return HTMLResponse(render_page("Chat", f"""
+
+@router.get("/register", response_class=HTMLResponse)
+async def register_page(request: Request, error: str = ""):
+    """Registration page."""
+    if SESSION_COOKIE_NAME in request.cookies and await get_current_user(request, None):
+        return RedirectResponse(url="/chat", status_code=302)
+
+    return cached_response(request, _render_register(_error_code(error)))
+
+
+# Chat page body up to its bootstrap data, the only per-user part of the page
+_CHAT_BODY_PRE = f"""
     <div class="chat-layout">
         <!-- Sidebar -->
         <aside class="sidebar" id="sidebar">
@@ -228,9 +234,9 @@ async def chat_page(request: Request, conversation_id: str = None):
             <div class="sidebar-footer">
                 <div class="user-info">
                     <span class="user-avatar">U</span>
-                    <span class="user-name">{user.get('username', 'User')}</span>
+                    <span class="user-name" id="userName"></span>
                 </div>
-                {admin_link}
+                <a href="/admin" class="sidebar-link" id="adminLink" style="display: none;">Admin</a>
                 <a href="#" onclick="logout()" class="sidebar-link">Logout</a>
             </div>
         </aside>
@@ -250,6 +256,14 @@ async def chat_page(request: Request, conversation_id: str = None):
                 </div>
             </div>
 
+            <template id="welcomeTpl">
+                <div class="welcome-message" id="welcomeMessage">
+                    <div class="welcome-icon"></div>
+                    <h2>Start a new conversation</h2>
+                    <p>Ask questions about the Discord chat history.</p>
+                </div>
+            </template>
+
             <!-- Thinking/Status Panel -->
             <div class="thinking-panel" id="thinkingPanel" style="display: none;">
                 <div class="thinking-header">
@@ -277,34 +291,63 @@ async def chat_page(request: Request, conversation_id: str = None):
             </div>
         </main>
     </div>
-    <script>
-        const INITIAL_CONVERSATION_ID = {f'"{conversation_id}"' if conversation_id else 'null'};
-    </script>
-    """, include_chat_js=True))
+    <script type="application/json" id="bootstrap">"""
+_CHAT_BODY_POST = """</script>
+    """
 
 
-@router.get("/admin", response_class=HTMLResponse)
-async def admin_page(request: Request):
-    """Admin dashboard."""
+def _bootstrap_json(value) -> bytes:
+    """Encode bootstrap data as JSON that is inert inside a script element.
+
+    Escaping every <, > and & keeps user-controlled strings from closing the
+    tag or sending the parser into its escaped states via <!-- or <script.
+    """
+    return (
+        orjson.dumps(value)
+        .replace(b"<", b"\\u003c")
+        .replace(b">", b"\\u003e")
+        .replace(b"&", b"\\u0026")
+    )
+
+
+# One route serves both /chat and /chat/{conversation_id}
+@router.get("/chat{path:path}", response_class=HTMLResponse)
+async def chat_page(request: Request, path: str):
+    """Main chat interface."""
+    if path and (path[0] != "/" or "/" in path[1:]):
+        raise HTTPException(status_code=404, detail="Not found")
+    conversation_id = path[1:]
+    if SESSION_COOKIE_NAME not in request.cookies:
+        return RedirectResponse(url="/login", status_code=302)
     user = await get_current_user(request, None)
     if not user:
         return RedirectResponse(url="/login", status_code=302)
-    if user.get("role") != "admin":
-        return RedirectResponse(url="/chat", status_code=302)
 
-    return HTMLResponse(render_page("Admin Dashboard", f"""
+    return html_response(b"".join((
+        _CHAT_SHELL_PRE,
+        _bootstrap_json({
+            "conversation_id": conversation_id or None,
+            "username": user.get("username", "User"),
+            "is_admin": user.get("role") == "admin",
+        }),
+        _CHAT_SHELL_POST,
+    )))
+
+
+# Admin dashboard body; its script tag is appended once ADMIN_JS_URL is known
+_ADMIN_BODY = f"""
     <div class="admin-layout">
         <aside class="admin-sidebar">
             <div class="admin-logo">
                 <a href="/chat">{APP_NAME}</a>
             </div>
             <nav class="admin-nav">
-                <a href="#stats" class="admin-nav-item active" onclick="showSection('stats')">Statistics</a>
-                <a href="#users" class="admin-nav-item" onclick="showSection('users')">Users</a>
-                <a href="#invites" class="admin-nav-item" onclick="showSection('invites')">Invite Codes</a>
-                <a href="#discord" class="admin-nav-item" onclick="showSection('discord')">Discord Bot</a>
-                <a href="#settings" class="admin-nav-item" onclick="showSection('settings')">Settings</a>
-                <a href="#indexing" class="admin-nav-item" onclick="showSection('indexing')">Indexing</a>
+                <a href="#stats" id="nav-stats" class="admin-nav-item active" data-section="stats">Statistics</a>
+                <a href="#users" id="nav-users" class="admin-nav-item" data-section="users">Users</a>
+                <a href="#invites" id="nav-invites" class="admin-nav-item" data-section="invites">Invite Codes</a>
+                <a href="#discord" id="nav-discord" class="admin-nav-item" data-section="discord">Discord Bot</a>
+                <a href="#settings" id="nav-settings" class="admin-nav-item" data-section="settings">Settings</a>
+                <a href="#indexing" id="nav-indexing" class="admin-nav-item" data-section="indexing">Indexing</a>
             </nav>
             <div class="admin-sidebar-footer">
                 <a href="/chat">Back to Chat</a>
@@ -352,6 +395,9 @@ async def admin_page(request: Request):
                         </tbody>
                     </table>
                 </div>
+                <template id="userRowTpl">
+                    <tr><td></td><td></td><td></td><td></td><td></td><td><button class="btn">Edit</button></td></tr>
+                </template>
             </section>
 
             <!-- Invites Section -->
@@ -376,6 +422,9 @@ async def admin_page(request: Request):
                         </tbody>
                     </table>
                 </div>
+                <template id="inviteRowTpl">
+                    <tr><td><code></code></td><td></td><td></td><td></td><td></td><td><button class="btn">Deactivate</button></td></tr>
+                </template>
             </section>
 
             <!-- Discord Section -->
@@ -478,7 +527,7 @@ async def admin_page(request: Request):
 
                 <div class="settings-group">
                     <h3>Connected Servers</h3>
-                    <div class="table-container">
+                    <div class="table-container guilds-scroll" id="guildsScroll">
                         <table class="admin-table">
                             <thead>
                                 <tr>
@@ -494,6 +543,9 @@ async def admin_page(request: Request):
                             </tbody>
                         </table>
                     </div>
+                    <template id="guildRowTpl">
+                        <tr><td class="guild-cell"><div class="guild-icon"></div><div><div></div><small></small></div></td><td></td><td></td><td></td><td></td><td><button class="btn">Channels</button></td></tr>
+                    </template>
                 </div>
             </section>
 
@@ -589,12 +641,26 @@ async def admin_page(request: Request):
         </div>
     </div>
 
-    <script>{ADMIN_JS}</script>
-    """))
+"""
+
+
+@router.get("/admin", response_class=HTMLResponse)
+async def admin_page(request: Request):
+    """Admin dashboard."""
+    if SESSION_COOKIE_NAME not in request.cookies:
+        return RedirectResponse(url="/login", status_code=302)
+    user = await get_current_user(request, None)
+    if not user:
+        return RedirectResponse(url="/login", status_code=302)
+    if user.get("role") != "admin":
+        return RedirectResponse(url="/chat", status_code=302)
+
+    return cached_response(request, _ADMIN_PAGE)
 
 
 # ============== Styles ==============
 
+# Shared by every page
 BASE_STYLES = """
 * { box-sizing: border-box; margin: 0; padding: 0; }
 
@@ -618,6 +684,82 @@ body {
     min-height: 100vh;
 }
 
+/* Buttons */
+.btn {
+    padding: 0.75rem 1.5rem;
+    border-radius: 8px;
+    font-size: 0.875rem;
+    font-weight: 600;
+    cursor: pointer;
+    border: 1px solid var(--border);
+    background: var(--bg-tertiary);
+    color: var(--text-primary);
+    transition: background-color 0.2s;
+}
+
+.btn:hover {
+    background: var(--border);
+}
+
+.btn-primary {
+    background: var(--accent);
+    border-color: var(--accent);
+    color: white;
+}
+
+.btn-primary:hover {
+    background: var(--accent-hover);
+}
+
+.btn-block {
+    width: 100%;
+}
+
+.btn:disabled {
+    opacity: 0.6;
+    cursor: not-allowed;
+}
+
+/* Alerts */
+.alert {
+    padding: 0.75rem 1rem;
+    border-radius: 8px;
+    margin-bottom: 1rem;
+}
+
+.alert-error {
+    background: rgba(239, 68, 68, 0.1);
+    border: 1px solid var(--error);
+    color: var(--error);
+}
+
+.alert-success {
+    background: rgba(34, 197, 94, 0.1);
+    border: 1px solid var(--success);
+    color: var(--success);
+}
+
+/* Scrollbar */
+::-webkit-scrollbar {
+    width: 6px;
+}
+
+::-webkit-scrollbar-track {
+    background: transparent;
+}
+
+::-webkit-scrollbar-thumb {
+    background: var(--border);
+    border-radius: 3px;
+}
+
+::-webkit-scrollbar-thumb:hover {
+    background: var(--text-secondary);
+}
+"""
+
+# Login and register pages
+AUTH_STYLES = """
 /* Auth Pages */
 .auth-container {
     min-height: 100vh;
@@ -696,62 +838,10 @@ body {
     color: var(--accent);
     text-decoration: none;
 }
+"""
 
-/* Buttons */
-.btn {
-    padding: 0.75rem 1.5rem;
-    border-radius: 8px;
-    font-size: 0.875rem;
-    font-weight: 600;
-    cursor: pointer;
-    border: 1px solid var(--border);
-    background: var(--bg-tertiary);
-    color: var(--text-primary);
-    transition: all 0.2s;
-}
-
-.btn:hover {
-    background: var(--border);
-}
-
-.btn-primary {
-    background: var(--accent);
-    border-color: var(--accent);
-    color: white;
-}
-
-.btn-primary:hover {
-    background: var(--accent-hover);
-}
-
-.btn-block {
-    width: 100%;
-}
-
-.btn:disabled {
-    opacity: 0.6;
-    cursor: not-allowed;
-}
-
-/* Alerts */
-.alert {
-    padding: 0.75rem 1rem;
-    border-radius: 8px;
-    margin-bottom: 1rem;
-}
-
-.alert-error {
-    background: rgba(239, 68, 68, 0.1);
-    border: 1px solid var(--error);
-    color: var(--error);
-}
-
-.alert-success {
-    background: rgba(34, 197, 94, 0.1);
-    border: 1px solid var(--success);
-    color: var(--success);
-}
-
+# Chat page
+CHAT_STYLES = """
 /* Chat Layout */
 .chat-layout {
     display: flex;
@@ -795,7 +885,6 @@ body {
     align-items: center;
     gap: 0.5rem;
     color: var(--text-secondary);
-    transition: background 0.2s;
     margin-bottom: 2px;
 }
 
@@ -890,9 +979,6 @@ body {
         z-index: 100;
         height: 100%;
     }
-    .sidebar.hidden {
-        transform: translateX(-100%);
-    }
     .sidebar-toggle {
         display: block;
     }
@@ -1144,7 +1230,7 @@ body {
     display: flex;
     align-items: center;
     justify-content: center;
-    transition: background 0.2s;
+    transition: background-color 0.2s;
 }
 
 .send-btn:hover {
@@ -1160,7 +1246,10 @@ body {
     width: 20px;
     height: 20px;
 }
+"""
 
+# Admin dashboard
+ADMIN_STYLES = """
 /* Admin Layout */
 .admin-layout {
     display: flex;
@@ -1248,11 +1337,14 @@ body {
     margin-bottom: 1.5rem;
 }
 
-.stat-card {
+.stat-card, .settings-group {
     background: var(--bg-secondary);
-    padding: 1rem;
-    border-radius: 8px;
     border: 1px solid var(--border);
+    border-radius: 8px;
+}
+
+.stat-card {
+    padding: 1rem;
 }
 
 .stat-label {
@@ -1292,9 +1384,6 @@ body {
 }
 
 .settings-group {
-    background: var(--bg-secondary);
-    border: 1px solid var(--border);
-    border-radius: 8px;
     padding: 1.5rem;
     margin-bottom: 1.5rem;
 }
@@ -1462,31 +1551,95 @@ body {
     font-weight: 600;
 }
 
-/* Scrollbar */
-::-webkit-scrollbar {
-    width: 6px;
+.guilds-scroll {
+    max-height: 480px;
+    overflow-y: auto;
 }
 
-::-webkit-scrollbar-track {
-    background: transparent;
+.guild-cell {
+    display: flex;
+    align-items: center;
+    gap: 0.5rem;
 }
 
-::-webkit-scrollbar-thumb {
-    background: var(--border);
-    border-radius: 3px;
+.guild-cell small {
+    color: var(--text-secondary);
 }
 
-::-webkit-scrollbar-thumb:hover {
-    background: var(--text-secondary);
+.spacer-row td {
+    padding: 0;
+    border: 0;
+}
+"""
+
+
+AUTH_JS = """
+// Submit handler shared by the login and register forms
+function bindAuthForm(formId, url, fields, busyLabel, failMessage) {
+    const form = document.getElementById(formId);
+    if (!form) return;
+
+    form.addEventListener('submit', async (e) => {
+        e.preventDefault();
+        const btn = e.target.querySelector('button');
+        const label = btn.textContent;
+        btn.disabled = true;
+        btn.textContent = busyLabel;
+
+        const body = {};
+        for (const field of fields) {
+            body[field] = document.getElementById(field).value;
+        }
+
+        try {
+            const res = await fetch(url, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify(body)
+            });
+
+            if (res.ok) {
+                window.location.href = '/chat';
+                return;
+            }
+            const data = await res.json();
+            alert(data.detail || failMessage);
+        } catch (err) {
+            alert('Network error');
+        }
+        btn.disabled = false;
+        btn.textContent = label;
+    });
 }
+
+bindAuthForm('loginForm', '/platform/auth/login', ['username', 'password'], 'Signing in...', 'Login failed');
+bindAuthForm('registerForm', '/platform/auth/register', ['invite_code', 'username', 'email', 'password'], 'Creating account...', 'Registration failed');
 """
 
 
 CHAT_JS = """
-<script>
-let currentConversationId = INITIAL_CONVERSATION_ID;
+// Per-user values embedded in the otherwise static page
+const BOOTSTRAP = JSON.parse(document.getElementById('bootstrap').textContent);
+document.getElementById('userName').textContent = BOOTSTRAP.username;
+if (BOOTSTRAP.is_admin) {
+    document.getElementById('adminLink').style.display = '';
+}
+
+// Elements that live as long as the page, looked up once
+const messagesContainer = document.getElementById('messagesContainer');
+const messageInput = document.getElementById('messageInput');
+const chatForm = document.getElementById('chatForm');
+const sendBtn = document.getElementById('sendBtn');
+const thinkingPanel = document.getElementById('thinkingPanel');
+const thinkingContent = document.getElementById('thinkingContent');
+const chatTitle = document.getElementById('chatTitle');
+const conversationsList = document.getElementById('conversationsList');
+const welcomeTpl = document.getElementById('welcomeTpl').content;
+
+let currentConversationId = BOOTSTRAP.conversation_id;
 let isStreaming = false;
 let streamingContent = '';
+let streamFrame = 0;
 
 // Configure marked for safe rendering
 marked.setOptions({
@@ -1508,39 +1661,47 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // Auto-resize textarea
-    const textarea = document.getElementById('messageInput');
-    textarea.addEventListener('input', () => {
-        textarea.style.height = 'auto';
-        textarea.style.height = Math.min(textarea.scrollHeight, 200) + 'px';
+    messageInput.addEventListener('input', () => {
+        messageInput.style.height = 'auto';
+        messageInput.style.height = Math.min(messageInput.scrollHeight, 200) + 'px';
     });
 });
 
 // Handle form submission
-document.getElementById('chatForm').addEventListener('submit', async (e) => {
+chatForm.addEventListener('submit', async (e) => {
     e.preventDefault();
     if (isStreaming) return;
 
-    const input = document.getElementById('messageInput');
-    const message = input.value.trim();
+    const message = messageInput.value.trim();
     if (!message) return;
 
-    input.value = '';
-    input.style.height = 'auto';
+    messageInput.value = '';
+    messageInput.style.height = 'auto';
 
     await sendMessage(message);
 });
 
+// One listener for every sidebar item and its delete button
+conversationsList.addEventListener('click', (e) => {
+    const item = e.target.closest('.conversation-item');
+    if (!item) return;
+    if (e.target.closest('.delete-btn')) {
+        deleteConversation(item.dataset.id);
+    } else {
+        loadConversation(item.dataset.id);
+    }
+});
+
 function handleKeyDown(e) {
     if (e.key === 'Enter' && !e.shiftKey) {
         e.preventDefault();
-        document.getElementById('chatForm').dispatchEvent(new Event('submit'));
+        chatForm.dispatchEvent(new Event('submit'));
     }
 }
 
 async function sendMessage(message) {
     isStreaming = true;
     streamingContent = '';
-    const sendBtn = document.getElementById('sendBtn');
     sendBtn.disabled = true;
 
     // Hide welcome message
@@ -1550,14 +1711,13 @@ async function sendMessage(message) {
     addMessage('user', message);
 
     // Show thinking panel
-    const thinkingPanel = document.getElementById('thinkingPanel');
-    const thinkingContent = document.getElementById('thinkingContent');
     thinkingPanel.style.display = 'block';
     thinkingContent.innerHTML = '';
 
     // Create assistant message placeholder
     const assistantMsg = addMessage('assistant', '', true);
     const contentEl = assistantMsg.querySelector('.message-content');
+    const isNew = !currentConversationId;
 
     try {
         const response = await fetch('/platform/chat', {
@@ -1578,30 +1738,33 @@ async function sendMessage(message) {
             const {done, value} = await reader.read();
             if (done) break;
 
+            // Scan only the new complete lines; keep the partial tail for the next read
             buffer += decoder.decode(value, {stream: true});
-            const lines = buffer.split('\\n');
-            buffer = lines.pop();
-
-            for (const line of lines) {
-                if (line.startsWith('event: ')) {
-                    const eventType = line.slice(7);
-                    continue;
-                }
-                if (line.startsWith('data: ')) {
+            let start = 0;
+            let end;
+            while ((end = buffer.indexOf('\\n', start)) !== -1) {
+                // Only 'data: ' lines carry events; check the 'd' and ':' in place
+                if (buffer.charCodeAt(start) === 100 && buffer.charCodeAt(start + 4) === 58) {
                     try {
-                        const data = JSON.parse(line.slice(6));
-                        handleSSEEvent(data, contentEl, thinkingContent, sources);
+                        const data = JSON.parse(buffer.slice(start + 6, end));
+                        handleSSEEvent(data, contentEl, sources);
                     } catch {}
                 }
+                start = end + 1;
             }
+            buffer = buffer.slice(start);
         }
 
+        flushStreamRender(contentEl);
+
         // Add sources if any
         if (sources.length > 0) {
             addSourcesToMessage(assistantMsg, sources);
         }
 
     } catch (err) {
+        cancelAnimationFrame(streamFrame);
+        streamFrame = 0;
         contentEl.textContent = 'Error: ' + err.message;
     }
 
@@ -1609,11 +1772,15 @@ async function sendMessage(message) {
     isStreaming = false;
     sendBtn.disabled = false;
 
-    // Reload conversations to update sidebar
-    loadConversations();
+    // Only a newly created conversation needs the sidebar refetched
+    if (isNew && currentConversationId) {
+        loadConversations();
+    } else {
+        bumpConversation(currentConversationId);
+    }
 }
 
-function handleSSEEvent(data, contentEl, thinkingContent, sources) {
+function handleSSEEvent(data, contentEl, sources) {
     if (data.id) {
         // Conversation ID
         currentConversationId = data.id;
@@ -1646,10 +1813,9 @@ function handleSSEEvent(data, contentEl, thinkingContent, sources) {
         thinkingContent.scrollTop = thinkingContent.scrollHeight;
     }
     if (data.text) {
-        // Content chunk - accumulate and render markdown
+        // Content chunk - accumulate and render markdown on the next frame
         streamingContent += data.text;
-        contentEl.innerHTML = renderMarkdown(streamingContent);
-        scrollToBottom();
+        scheduleStreamRender(contentEl);
     }
     if (data.sources) {
         // Sources
@@ -1657,11 +1823,35 @@ function handleSSEEvent(data, contentEl, thinkingContent, sources) {
     }
     if (data.title) {
         // Title update
-        document.getElementById('chatTitle').textContent = data.title;
-        loadConversations();
+        chatTitle.textContent = data.title;
+        const item = conversationItems.get(currentConversationId);
+        if (item) {
+            item.firstChild.textContent = data.title;
+        }
     }
 }
 
+// Re-render the streamed markdown at most once per frame, however many chunks arrive
+function scheduleStreamRender(contentEl) {
+    if (streamFrame) return;
+    streamFrame = requestAnimationFrame(() => {
+        streamFrame = 0;
+        renderStream(contentEl);
+    });
+}
+
+function flushStreamRender(contentEl) {
+    if (!streamFrame) return;
+    cancelAnimationFrame(streamFrame);
+    streamFrame = 0;
+    renderStream(contentEl);
+}
+
+function renderStream(contentEl) {
+    contentEl.innerHTML = renderMarkdown(streamingContent);
+    scrollToBottom();
+}
+
 function formatToolCall(tool, args) {
     switch (tool) {
         case 'search_messages':
@@ -1686,7 +1876,6 @@ function formatToolCall(tool, args) {
 }
 
 function addMessage(role, content, isStreamPlaceholder = false) {
-    const container = document.getElementById('messagesContainer');
     const msg = document.createElement('div');
     msg.className = 'message ' + role;
 
@@ -1706,7 +1895,7 @@ function addMessage(role, content, isStreamPlaceholder = false) {
         </div>
         <div class="message-content">${renderedContent}</div>
     `;
-    container.appendChild(msg);
+    messagesContainer.appendChild(msg);
     scrollToBottom();
     return msg;
 }
@@ -1732,29 +1921,77 @@ function addSourcesToMessage(msgEl, sources) {
 }
 
 function scrollToBottom() {
-    const container = document.getElementById('messagesContainer');
-    container.scrollTop = container.scrollHeight;
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
 }
 
+const HTML_ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'};
+
 function escapeHtml(text) {
-    const div = document.createElement('div');
-    div.textContent = text;
-    return div.innerHTML;
+    return String(text ?? '').replace(/[&<>"']/g, c => HTML_ESCAPES[c]);
+}
+
+// Sidebar items by conversation id, reused across refreshes
+const conversationItems = new Map();
+
+function createConversationItem(id) {
+    const item = document.createElement('div');
+    item.className = 'conversation-item';
+    item.dataset.id = id;
+
+    const title = document.createElement('span');
+    title.className = 'title';
+    const deleteBtn = document.createElement('button');
+    deleteBtn.className = 'delete-btn';
+    deleteBtn.textContent = 'x';
+
+    item.append(title, deleteBtn);
+    return item;
+}
+
+// Update the sidebar in place, touching only items that changed
+function renderConversations(conversations) {
+    const seen = new Set();
+    let prev = null;
+
+    for (const c of conversations) {
+        seen.add(c.id);
+        let item = conversationItems.get(c.id);
+        if (!item) {
+            item = createConversationItem(c.id);
+            conversationItems.set(c.id, item);
+        }
+        if (item.firstChild.textContent !== c.title) {
+            item.firstChild.textContent = c.title;
+        }
+        item.classList.toggle('active', c.id === currentConversationId);
+
+        const next = prev ? prev.nextSibling : conversationsList.firstChild;
+        if (next !== item) {
+            conversationsList.insertBefore(item, next);
+        }
+        prev = item;
+    }
+
+    for (const [id, item] of conversationItems) {
+        if (!seen.has(id)) {
+            item.remove();
+            conversationItems.delete(id);
+        }
+    }
+}
+
+// Move a conversation to the top of the sidebar without refetching the list
+function bumpConversation(id) {
+    const item = conversationItems.get(id);
+    if (item && item !== conversationsList.firstChild) {
+        conversationsList.prepend(item);
+    }
 }
 
 async function loadConversations() {
     try {
         const res = await fetch('/platform/conversations');
-        const conversations = await res.json();
-
-        const list = document.getElementById('conversationsList');
-        list.innerHTML = conversations.map(c => `
-            <div class="conversation-item ${c.id === currentConversationId ? 'active' : ''}"
-                 onclick="loadConversation('${c.id}')">
-                <span class="title">${escapeHtml(c.title)}</span>
-                <button class="delete-btn" onclick="event.stopPropagation(); deleteConversation('${c.id}')">x</button>
-            </div>
-        `).join('');
+        renderConversations(await res.json());
     } catch {}
 }
 
@@ -1766,11 +2003,10 @@ async function loadConversation(id) {
         currentConversationId = id;
         history.replaceState(null, '', '/chat/' + id);
 
-        document.getElementById('chatTitle').textContent = conv.title;
+        chatTitle.textContent = conv.title;
         document.getElementById('welcomeMessage').style.display = 'none';
 
-        const container = document.getElementById('messagesContainer');
-        container.innerHTML = '';
+        messagesContainer.innerHTML = '';
 
         conv.messages.forEach(m => {
             const msg = addMessage(m.role, m.content);
@@ -1786,14 +2022,8 @@ async function loadConversation(id) {
 async function newConversation() {
     currentConversationId = null;
     history.replaceState(null, '', '/chat');
-    document.getElementById('chatTitle').textContent = 'New Chat';
-    document.getElementById('messagesContainer').innerHTML = `
-        <div class="welcome-message" id="welcomeMessage">
-            <div class="welcome-icon"></div>
-            <h2>Start a new conversation</h2>
-            <p>Ask questions about the Discord chat history.</p>
-        </div>
-    `;
+    chatTitle.textContent = 'New Chat';
+    messagesContainer.replaceChildren(welcomeTpl.cloneNode(true));
     loadConversations();
 }
 
@@ -1817,19 +2047,37 @@ async function logout() {
     await fetch('/platform/auth/logout', {method: 'POST'});
     window.location.href = '/login';
 }
-</script>
 """
 
 
 ADMIN_JS = """
 // Admin JS
+
+// Each section fetches its data the first time it is shown
+const SECTION_LOADERS = {
+    stats: loadStats,
+    users: loadUsers,
+    invites: loadInvites,
+    discord: loadDiscordSettings,
+    settings: loadSettings,
+    indexing: loadIndexStats
+};
+const loadedSections = new Set();
+
+function loadSection(name) {
+    if (loadedSections.has(name)) return;
+    loadedSections.add(name);
+    SECTION_LOADERS[name]();
+}
+
 document.addEventListener('DOMContentLoaded', () => {
-    loadStats();
-    loadUsers();
-    loadInvites();
-    loadSettings();
-    loadIndexStats();
-    loadDiscordSettings();
+    loadSection('stats');
+});
+
+// One listener for every nav item
+document.querySelector('.admin-nav').addEventListener('click', (e) => {
+    const item = e.target.closest('[data-section]');
+    if (item) showSection(item.dataset.section);
 });
 
 function showSection(name) {
@@ -1837,7 +2085,28 @@ function showSection(name) {
     document.querySelectorAll('.admin-nav-item').forEach(n => n.classList.remove('active'));
 
     document.getElementById(name + '-section').classList.add('active');
-    document.querySelector(`[onclick="showSection('${name}')"]`).classList.add('active');
+    document.getElementById('nav-' + name).classList.add('active');
+    loadSection(name);
+}
+
+let _statEls = null;
+
+function statElements() {
+    if (!_statEls) {
+        _statEls = {
+            totalUsers: document.getElementById('statTotalUsers'),
+            activeUsers: document.getElementById('statActiveUsers'),
+            conversations: document.getElementById('statConversations'),
+            messages: document.getElementById('statMessages'),
+            invites: document.getElementById('statInvites'),
+            newToday: document.getElementById('statNewToday'),
+            queries: document.getElementById('statQueries'),
+            queriesToday: document.getElementById('statQueriesToday'),
+            avgResponse: document.getElementById('statAvgResponse'),
+            errors: document.getElementById('statErrors')
+        };
+    }
+    return _statEls;
 }
 
 async function loadStats() {
@@ -1850,57 +2119,106 @@ async function loadStats() {
         const platform = await platformRes.json();
         const query = await queryRes.json();
 
-        document.getElementById('statTotalUsers').textContent = platform.total_users;
-        document.getElementById('statActiveUsers').textContent = platform.active_users;
-        document.getElementById('statConversations').textContent = platform.total_conversations;
-        document.getElementById('statMessages').textContent = platform.total_messages;
-        document.getElementById('statInvites').textContent = platform.active_invite_codes;
-        document.getElementById('statNewToday').textContent = platform.users_registered_today;
-
-        document.getElementById('statQueries').textContent = query.stats.total_queries;
-        document.getElementById('statQueriesToday').textContent = query.stats.queries_today;
-        document.getElementById('statAvgResponse').textContent = Math.round(query.stats.avg_response_time_ms) + 'ms';
-        document.getElementById('statErrors').textContent = query.stats.error_count;
+        // Write every card in one frame so the grid is invalidated once
+        requestAnimationFrame(() => {
+            const els = statElements();
+            els.totalUsers.textContent = platform.total_users;
+            els.activeUsers.textContent = platform.active_users;
+            els.conversations.textContent = platform.total_conversations;
+            els.messages.textContent = platform.total_messages;
+            els.invites.textContent = platform.active_invite_codes;
+            els.newToday.textContent = platform.users_registered_today;
+
+            els.queries.textContent = query.stats.total_queries;
+            els.queriesToday.textContent = query.stats.queries_today;
+            els.avgResponse.textContent = query.stats.avg_response_time;
+            els.errors.textContent = query.stats.error_count;
+        });
     } catch {}
 }
 
+// Clone a row from a <template> and fill its leading cells as text
+function templateRow(templateId, values) {
+    const row = document.getElementById(templateId).content.firstElementChild.cloneNode(true);
+    values.forEach((value, i) => {
+        if (value !== null) row.cells[i].textContent = value;
+    });
+    return row;
+}
+
+// Fetch an NDJSON list, yielding the objects of each network chunk as they arrive
+async function* fetchNdjson(url) {
+    const res = await fetch(url, {headers: {'Accept': 'application/x-ndjson'}});
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const {done, value} = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, {stream: true});
+        const batch = [];
+        let start = 0;
+        let end;
+        while ((end = buffer.indexOf('\\n', start)) !== -1) {
+            if (end > start) batch.push(JSON.parse(buffer.slice(start, end)));
+            start = end + 1;
+        }
+        buffer = buffer.slice(start);
+        if (batch.length) yield batch;
+    }
+}
+
 async function loadUsers() {
     try {
-        const res = await fetch('/platform/admin/users');
-        const users = await res.json();
-
-        document.getElementById('usersTableBody').innerHTML = users.map(u => `
-            <tr>
-                <td>${u.username}</td>
-                <td>${u.email}</td>
-                <td>${u.role}</td>
-                <td>${u.status}</td>
-                <td>${new Date(u.created_at).toLocaleDateString()}</td>
-                <td>
-                    <button class="btn" onclick="editUser('${u.id}')">Edit</button>
-                </td>
-            </tr>
-        `).join('');
+        const tbody = document.getElementById('usersTableBody');
+        tbody.replaceChildren();
+
+        for await (const users of fetchNdjson('/platform/admin/users')) {
+            const rows = document.createDocumentFragment();
+            for (const u of users) {
+                const row = templateRow('userRowTpl', [
+                    u.username,
+                    u.email,
+                    u.role,
+                    u.status,
+                    new Date(u.created_at).toLocaleDateString()
+                ]);
+                row.querySelector('button').onclick = () => editUser(u.id);
+                rows.appendChild(row);
+            }
+            tbody.appendChild(rows);
+        }
     } catch {}
 }
 
 async function loadInvites() {
     try {
-        const res = await fetch('/platform/admin/invite-codes');
-        const codes = await res.json();
-
-        document.getElementById('invitesTableBody').innerHTML = codes.map(c => `
-            <tr>
-                <td><code>${c.code}</code></td>
-                <td>${c.current_uses}/${c.max_uses}</td>
-                <td>${c.expires_at ? new Date(c.expires_at).toLocaleDateString() : 'Never'}</td>
-                <td>${c.note || '-'}</td>
-                <td>${c.is_active ? 'Active' : 'Inactive'}</td>
-                <td>
-                    ${c.is_active ? `<button class="btn" onclick="deactivateInvite('${c.code}')">Deactivate</button>` : ''}
-                </td>
-            </tr>
-        `).join('');
+        const tbody = document.getElementById('invitesTableBody');
+        tbody.replaceChildren();
+
+        for await (const codes of fetchNdjson('/platform/admin/invite-codes')) {
+            const rows = document.createDocumentFragment();
+            for (const c of codes) {
+                const row = templateRow('inviteRowTpl', [
+                    null,
+                    `${c.current_uses}/${c.max_uses}`,
+                    c.expires_at ? new Date(c.expires_at).toLocaleDateString() : 'Never',
+                    c.note || '-',
+                    c.is_active ? 'Active' : 'Inactive'
+                ]);
+                row.querySelector('code').textContent = c.code;
+                const button = row.querySelector('button');
+                if (c.is_active) {
+                    button.onclick = () => deactivateInvite(c.code);
+                } else {
+                    button.remove();
+                }
+                rows.appendChild(row);
+            }
+            tbody.appendChild(rows);
+        }
     } catch {}
 }
 
@@ -2065,19 +2383,125 @@ function editUser(id) {
 
 let discordPermissions = {};
 
+// Only the guild rows inside the scroll viewport are kept in the DOM
+const GUILD_OVERSCAN = 5;
+let guildRows = [];
+let guildRowHeight = 0;
+let guildScrollFrame = 0;
+
+const EMPTY_GUILDS_ROW = document.createElement('tr');
+EMPTY_GUILDS_ROW.appendChild(document.createElement('td')).colSpan = 6;
+EMPTY_GUILDS_ROW.cells[0].textContent = 'No guilds indexed yet';
+
+// One listener for every row's Channels button
+document.getElementById('guildsTableBody').addEventListener('click', (e) => {
+    const btn = e.target.closest('button[data-guild-id]');
+    if (btn) showGuildChannels(btn.dataset.guildId, btn.dataset.guildName);
+});
+
+document.getElementById('guildsScroll').addEventListener('scroll', () => {
+    if (!guildScrollFrame) guildScrollFrame = requestAnimationFrame(renderGuildWindow);
+}, {passive: true});
+
+// Derive a guild's display values once, not every time its row scrolls into view
+function prepareGuild(g) {
+    const name = g.guild_name || 'Unknown';
+    return {
+        id: g.guild_id,
+        name,
+        initial: name.charAt(0).toUpperCase(),
+        icon: g.guild_icon,
+        cells: [
+            null,
+            g.member_count || '-',
+            g.total_messages,
+            g.indexed_channels,
+            g.last_indexed ? new Date(g.last_indexed).toLocaleString() : 'Never'
+        ]
+    };
+}
+
+function guildRow(g) {
+    const row = templateRow('guildRowTpl', g.cells);
+    const [icon, label] = row.cells[0].children;
+    if (g.icon) {
+        const img = document.createElement('img');
+        img.className = 'guild-icon';
+        img.src = g.icon;
+        img.alt = '';
+        icon.replaceWith(img);
+    } else {
+        icon.textContent = g.initial;
+    }
+    label.firstElementChild.textContent = g.name;
+    label.lastElementChild.textContent = g.id;
+    const button = row.querySelector('button');
+    button.dataset.guildId = g.id;
+    button.dataset.guildName = g.name;
+    return row;
+}
+
+function spacerRow(height) {
+    const row = document.createElement('tr');
+    row.className = 'spacer-row';
+    row.style.height = height + 'px';
+    row.appendChild(document.createElement('td')).colSpan = 6;
+    return row;
+}
+
+function renderGuildWindow() {
+    guildScrollFrame = 0;
+    const tbody = document.getElementById('guildsTableBody');
+
+    if (guildRows.length === 0) {
+        tbody.replaceChildren(EMPTY_GUILDS_ROW.cloneNode(true));
+        return;
+    }
+
+    // Measure one real row the first time the table is visible
+    if (!guildRowHeight) {
+        const probe = guildRow(guildRows[0]);
+        tbody.replaceChildren(probe);
+        guildRowHeight = probe.offsetHeight;
+    }
+    const rowHeight = guildRowHeight || 57;
+
+    const scroller = document.getElementById('guildsScroll');
+    const visible = Math.ceil(scroller.clientHeight / rowHeight);
+    const first = Math.min(
+        Math.max(0, Math.floor(scroller.scrollTop / rowHeight) - GUILD_OVERSCAN),
+        Math.max(0, guildRows.length - visible - GUILD_OVERSCAN)
+    );
+    const last = Math.min(guildRows.length, first + visible + 2 * GUILD_OVERSCAN);
+
+    const rows = document.createDocumentFragment();
+    if (first > 0) rows.appendChild(spacerRow(first * rowHeight));
+    for (let i = first; i < last; i++) {
+        rows.appendChild(guildRow(guildRows[i]));
+    }
+    if (last < guildRows.length) rows.appendChild(spacerRow((guildRows.length - last) * rowHeight));
+    tbody.replaceChildren(rows);
+}
+
+// The permission list is static server config, so one fetch per tab is enough
+const PERMISSIONS_CACHE_KEY = 'discord_perms_v1';
+
 async function loadDiscordSettings() {
     try {
+        const cachedPermissions = sessionStorage.getItem(PERMISSIONS_CACHE_KEY);
         const [discordRes, guildsRes, statusRes, inviteRes] = await Promise.all([
             fetch('/platform/admin/discord'),
             fetch('/platform/admin/discord/guilds'),
             fetch('/platform/admin/discord/status'),
-            fetch('/platform/admin/discord/invite')
+            cachedPermissions ? null : fetch('/platform/admin/discord/invite')
         ]);
 
-        const discord = await discordRes.json();
-        const guildsData = await guildsRes.json();
-        const status = await statusRes.json();
-        const invite = await inviteRes.json();
+        const [discord, guildsData, status, invite] = await Promise.all([
+            discordRes.json(),
+            guildsRes.json(),
+            statusRes.json(),
+            inviteRes && inviteRes.json()
+        ]);
 
         // Bot online status
         const onlineEl = document.getElementById('discordBotOnline');
@@ -2121,35 +2545,19 @@ async function loadDiscordSettings() {
         document.getElementById('quietPeriod').value = discord.quiet_period_minutes;
         document.getElementById('backoffMinutes').value = discord.backoff_minutes;
 
-        // Store permissions for invite link generation
-        if (invite.permissions) {
-            discordPermissions = invite.permissions;
+        // Store permissions for invite link generation; the checkboxes are built once
+        if (invite && invite.permissions) {
+            sessionStorage.setItem(PERMISSIONS_CACHE_KEY, JSON.stringify(invite.permissions));
+        }
+        const permissions = invite ? invite.permissions : JSON.parse(cachedPermissions);
+        if (permissions && !Object.keys(discordPermissions).length) {
+            discordPermissions = permissions;
             setupPermissionCheckboxes();
         }
 
-        // Guilds table with improved display
-        document.getElementById('guildsTableBody').innerHTML = guildsData.guilds.map(g => {
-            const iconHtml = g.guild_icon
-                ? `<img src="${g.guild_icon}" class="guild-icon" alt="">`
-                : `<div class="guild-icon">${(g.guild_name || 'U')[0].toUpperCase()}</div>`;
-            return `
-            <tr>
-                <td style="display: flex; align-items: center; gap: 0.5rem;">
-                    ${iconHtml}
-                    <div>
-                        <div>${g.guild_name || 'Unknown'}</div>
-                        <small style="color: var(--text-secondary);">${g.guild_id}</small>
-                    </div>
-                </td>
-                <td>${g.member_count || '-'}</td>
-                <td>${g.total_messages}</td>
-                <td>${g.indexed_channels}</td>
-                <td>${g.last_indexed ? new Date(g.last_indexed).toLocaleString() : 'Never'}</td>
-                <td>
-                    <button class="btn" onclick="showGuildChannels('${g.guild_id}', '${g.guild_name || 'Unknown'}')">Channels</button>
-                </td>
-            </tr>
-        `}).join('') || '<tr><td colspan="6">No guilds indexed yet</td></tr>';
+        // Guilds table, rendered a viewport at a time
+        guildRows = guildsData.guilds.map(prepareGuild);
+        renderGuildWindow();
 
     } catch (err) {
         console.error('Failed to load Discord settings:', err);
@@ -2157,21 +2565,26 @@ async function loadDiscordSettings() {
 }
 
 function setupPermissionCheckboxes() {
-    const container = document.getElementById('permissionCheckboxes');
-    container.innerHTML = Object.entries(discordPermissions).map(([key, perm]) => `
-        <label class="permission-item">
-            <input type="checkbox" name="perm" value="${key}">
-            ${perm.description}
-        </label>
-    `).join('');
-
-    // Show/hide custom permissions based on preset selection
-    document.getElementById('invitePreset').addEventListener('change', (e) => {
-        const customDiv = document.getElementById('customPermissions');
-        customDiv.style.display = e.target.value === 'custom' ? 'block' : 'none';
-    });
+    const items = document.createDocumentFragment();
+    for (const [key, perm] of Object.entries(discordPermissions)) {
+        const label = document.createElement('label');
+        label.className = 'permission-item';
+        const cb = document.createElement('input');
+        cb.type = 'checkbox';
+        cb.name = 'perm';
+        cb.value = key;
+        label.append(cb, ' ', perm.description);
+        items.appendChild(label);
+    }
+    document.getElementById('permissionCheckboxes').replaceChildren(items);
 }
 
+// Show/hide custom permissions based on preset selection
+document.getElementById('invitePreset').addEventListener('change', (e) => {
+    const customDiv = document.getElementById('customPermissions');
+    customDiv.style.display = e.target.value === 'custom' ? 'block' : 'none';
+});
+
 async function generateInviteLink() {
     const preset = document.getElementById('invitePreset').value;
     const resultEl = document.getElementById('inviteLinkResult');
@@ -2243,15 +2656,25 @@ async function showGuildChannels(guildId, guildName) {
             return;
         }
 
-        const channelHtml = data.channels.map(ch => `
-            <div class="channel-item">
-                <input type="checkbox" value="${ch.id}" data-name="${ch.name}">
-                <span class="channel-icon">#</span>
-                <span>${ch.name}</span>
-            </div>
-        `).join('');
+        const list = document.createElement('div');
+        list.className = 'channel-list';
+        for (const ch of data.channels) {
+            const item = document.createElement('div');
+            item.className = 'channel-item';
+            const cb = document.createElement('input');
+            cb.type = 'checkbox';
+            cb.value = ch.id;
+            cb.dataset.name = ch.name;
+            const icon = document.createElement('span');
+            icon.className = 'channel-icon';
+            icon.textContent = '#';
+            const name = document.createElement('span');
+            name.textContent = ch.name;
+            item.append(cb, icon, name);
+            list.appendChild(item);
+        }
 
-        document.getElementById('guildChannelsList').innerHTML = `<div class="channel-list">${channelHtml}</div>`;
+        document.getElementById('guildChannelsList').replaceChildren(list);
     } catch {
         document.getElementById('guildChannelsList').innerHTML = '<p style="color: var(--error);">Failed to load channels</p>';
     }
@@ -2368,3 +2791,101 @@ async function triggerIngestion() {
     }
 }
 """
+
+
+# ============== Static Assets ==============
+# Served from URLs that embed a content hash, so browsers can cache them forever
+# and a deploy that changes them produces new URLs.
+
+_STATIC_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# filename -> (identity, gzip) variants, each as (content, headers)
+_STATIC_ASSETS: dict[str, tuple[tuple[bytes, dict], tuple[bytes, dict]]] = {}
+
+
+def _minify_css(source: str) -> str:
+    """Strip comments and redundant whitespace, semicolons and digits from a stylesheet.
+
+    Spaces around '+' are kept because calc() needs them.
+    """
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.S)
+    source = re.sub(r"\s+", " ", source)
+    source = re.sub(r"\s*([{};:,>~])\s*", r"\1", source)
+    source = source.replace(";}", "}")
+    source = re.sub(r"(?<![\w.#-])0\.(\d)", r".\1", source)
+    source = re.sub(r"#([0-9a-fA-F])\1([0-9a-fA-F])\2([0-9a-fA-F])\3\b", r"#\1\2\3", source)
+    return source.strip()
+
+
+def _minify_js(source: str) -> str:
+    """Drop indentation, blank lines and whole-line comments from a script.
+
+    Line breaks are kept so automatic semicolon insertion is unaffected.
+    """
+    lines = (line.strip() for line in source.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+def _static_asset(stem: str, ext: str, source: str, media_type: str) -> str:
+    """Register an asset, compressing it once, and return its hashed URL."""
+    content = source.encode("utf-8")
+    filename = f"{stem}.{hashlib.blake2b(content, digest_size=8).hexdigest()}.{ext}"
+    _STATIC_ASSETS[filename] = precompress(content, _STATIC_CACHE_CONTROL, media_type)
+    return f"/static/{filename}"
+
+
+# Each page gets one stylesheet holding only the rules it uses
+AUTH_CSS_URL = _static_asset("auth", "css", _minify_css(BASE_STYLES + AUTH_STYLES), "text/css; charset=utf-8")
+CHAT_CSS_URL = _static_asset("chat", "css", _minify_css(BASE_STYLES + CHAT_STYLES), "text/css; charset=utf-8")
+ADMIN_CSS_URL = _static_asset("admin", "css", _minify_css(BASE_STYLES + ADMIN_STYLES), "text/css; charset=utf-8")
+AUTH_JS_URL = _static_asset("auth", "js", _minify_js(AUTH_JS), "text/javascript; charset=utf-8")
+CHAT_JS_URL = _static_asset("chat", "js", _minify_js(CHAT_JS), "text/javascript; charset=utf-8")
+ADMIN_JS_URL = _static_asset("admin", "js", _minify_js(ADMIN_JS), "text/javascript; charset=utf-8")
+
+
+# ============== Precompiled Page Fragments ==============
+# Built once at import so rendering a page only splices in the title and body.
+
+_PAGE_HEAD = b"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>"""
+_PAGE_HEAD_AUTH = f""" - {APP_NAME}</title>
+    <link rel="stylesheet" href="{AUTH_CSS_URL}">
+</head>
+<body>
+    """.encode("utf-8")
+_PAGE_HEAD_ADMIN = f""" - {APP_NAME}</title>
+    <link rel="stylesheet" href="{ADMIN_CSS_URL}">
+</head>
+<body>
+    """.encode("utf-8")
+# Chat pages also load marked.js for markdown rendering
+_PAGE_HEAD_CHAT = f""" - {APP_NAME}</title>
+    <link rel="stylesheet" href="{CHAT_CSS_URL}">
+    <script src="https://cdn.jsdelivr.net/npm/marked/marked.min.js"></script>
+</head>
+<body>
+    """.encode("utf-8")
+_PAGE_TAIL_PLAIN = b"""
+</body>
+</html>"""
+_PAGE_TAIL_CHAT = f"""
+    <script src="{CHAT_JS_URL}"></script>
+</body>
+</html>""".encode("utf-8")
+
+# Script tag closing the login and register pages
+_AUTH_SCRIPT = f"""<script src="{AUTH_JS_URL}"></script>
+"""
+
+# The admin page is the same for every admin, so it is rendered only once
+_ADMIN_PAGE = precompress(render_page_plain("Admin Dashboard", f"""{_ADMIN_BODY}    <script src="{ADMIN_JS_URL}"></script>
+    """, _PAGE_HEAD_ADMIN), CACHE_PRIVATE)
+
+
+# The chat page is the same for every user apart from its bootstrap JSON
+_CHAT_SHELL_PRE = b"".join((_PAGE_HEAD, b"Chat", _PAGE_HEAD_CHAT, _CHAT_BODY_PRE.encode("utf-8")))
+_CHAT_SHELL_POST = b"".join((_CHAT_BODY_POST.encode("utf-8"), _PAGE_TAIL_CHAT))
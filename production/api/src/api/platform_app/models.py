@@ -76,6 +76,10 @@ class InviteCodeCreate(BaseModel):
     note: Optional[str] = Field(None, max_length=200)
 
 
+class InviteCodeBulkCreate(InviteCodeCreate):
+    count: int = Field(10, ge=1, le=100)
+
+
 class InviteCodeResponse(BaseModel):
     code: str
     created_by: str
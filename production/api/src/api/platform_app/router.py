@@ -8,11 +8,15 @@ Provides endpoints for:
 """
 import os
 import json
+import orjson
+import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, AsyncIterator
 from fastapi import APIRouter, Request, Response, HTTPException, Depends, Form, Query
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, ORJSONResponse
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 from platform_app.auth import (
     require_user,
@@ -21,6 +25,7 @@ from platform_app.auth import (
     login_user,
     logout_user,
     user_to_response,
+    SESSION_COOKIE_NAME,
 )
 from platform_app.database import (
     create_user,
@@ -29,24 +34,27 @@ from platform_app.database import (
     get_user_by_id,
     update_user,
     change_password,
-    list_users,
-    count_users,
+    iter_users,
+    count_users_facets,
     delete_user_sessions,
     validate_invite_code,
     use_invite_code,
+    release_invite_code,
     create_invite_code,
-    list_invite_codes,
+    create_invite_codes_bulk,
+    iter_invite_codes,
     deactivate_invite_code,
     count_active_invite_codes,
     create_conversation,
     get_conversation,
+    get_conversation_messages,
     update_conversation,
     delete_conversation,
     list_conversations,
     count_conversations,
     count_messages,
     add_message_to_conversation,
-    generate_conversation_title,
+    conversation_title_from_message,
     verify_password,
 )
 from platform_app.models import (
@@ -59,6 +67,7 @@ from platform_app.models import (
     PasswordChange,
     TokenResponse,
     InviteCodeCreate,
+    InviteCodeBulkCreate,
     InviteCodeResponse,
     ConversationCreate,
     ConversationResponse,
@@ -73,17 +82,75 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/platform", tags=["platform"])
 
+# Environment-derived settings, resolved once at import
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+SECURE_COOKIES = os.getenv("SECURE_COOKIES", "false").lower() == "true"
+DISCORD_BOT_TOKEN_SET = bool(os.getenv("DISCORD_BOT_TOKEN"))
+DISCORD_BOT_CLIENT_ID = os.getenv("DISCORD_BOT_CLIENT_ID", "")
+DISCORD_CHANNEL_IDS_ENV = tuple(
+    c.strip() for c in os.getenv("DISCORD_CHANNEL_IDS", "").split(",") if c.strip()
+)
+SCHEDULE_CRON_DEFAULT = os.getenv("SCHEDULE_CRON", "0 3 * * *")
+QUIET_PERIOD_MINUTES_DEFAULT = int(os.getenv("QUIET_PERIOD_MINUTES", 15))
+BACKOFF_MINUTES_DEFAULT = int(os.getenv("BACKOFF_MINUTES", 10))
+API_KEY_SET = bool(os.getenv("API_KEY"))
+INGEST_STREAM_KEY = "discord_rag:ingest_stream"
+INGEST_STREAM_MAXLEN = 10000
+GUILDS_CACHE_KEY = "discord_rag:admin:guilds_cache"
+GUILDS_CACHE_TTL = 30
+
+SESSION_COOKIE_KW = dict(
+    key=SESSION_COOKIE_NAME,
+    httponly=True,
+    max_age=7 * 24 * 60 * 60,  # 7 days
+    samesite="lax",
+    secure=SECURE_COOKIES,
+)
+
+
+def _set_session_cookie(response: Response, token: str):
+    """Set the platform session cookie on a response."""
+    response.set_cookie(value=token, **SESSION_COOKIE_KW)
+
+
+def _token_response(result: dict) -> Response:
+    """Serialize a login result as a TokenResponse via pydantic-core."""
+    token = TokenResponse(
+        access_token=result["session"]["token"],
+        expires_at=result["session"]["expires_at"],
+        user=user_to_response(result["user"]),
+    )
+    return Response(content=token.model_dump_json(), media_type="application/json")
+
+
+async def _stream_json_array(rows: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Stream rows as a JSON array, serializing each row as it arrives."""
+    yield b"["
+    first = True
+    async for row in rows:
+        yield orjson.dumps(row) if first else b"," + orjson.dumps(row)
+        first = False
+    yield b"]"
+
+
+async def _stream_ndjson(rows: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Stream rows as newline-delimited JSON, one object per line."""
+    async for row in rows:
+        yield orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def _stream_rows(request: Request, rows: AsyncIterator[dict]) -> StreamingResponse:
+    """Stream rows as NDJSON when the client asks for it, else as a JSON array."""
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(_stream_ndjson(rows), media_type="application/x-ndjson")
+    return StreamingResponse(_stream_json_array(rows), media_type="application/json")
+
 
 # ============== Authentication ==============
 
 @router.post("/auth/register")
 async def register(request: UserCreate):
     """Register a new user with an invite code."""
-    # Validate invite code
-    is_valid, error = await validate_invite_code(request.invite_code)
-    if not is_valid:
-        raise HTTPException(status_code=400, detail=error)
-
     # Check if username exists
     if await get_user_by_username(request.username):
         raise HTTPException(status_code=400, detail="Username already taken")
@@ -92,38 +159,35 @@ async def register(request: UserCreate):
     if await get_user_by_email(request.email):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    # Create user
-    user = await create_user(
-        username=request.username,
-        email=request.email,
-        password=request.password,
-        invite_code_used=request.invite_code.upper()
-    )
+    # Atomically redeem the invite code for the user we're about to create
+    user_id = ObjectId()
+    if not await use_invite_code(request.invite_code, str(user_id)):
+        _, error = await validate_invite_code(request.invite_code)
+        raise HTTPException(status_code=400, detail=error or "Invalid invite code")
 
-    # Mark invite code as used
-    await use_invite_code(request.invite_code, str(user["_id"]))
+    # Create user
+    try:
+        user = await create_user(
+            username=request.username,
+            email=request.email,
+            password=request.password,
+            invite_code_used=request.invite_code.upper(),
+            user_id=user_id
+        )
+    except BaseException as e:
+        # No user was created (a lost username/email race, a database error,
+        # a cancelled request...); give the invite use back either way
+        await release_invite_code(request.invite_code, str(user_id))
+        if isinstance(e, DuplicateKeyError):
+            raise HTTPException(status_code=400, detail="Username or email already registered")
+        raise
 
     # Log in the user
     result = await login_user(request.username, request.password)
 
-    response = Response(
-        content=json.dumps({
-            "user": user_to_response(result["user"]),
-            "access_token": result["session"]["token"],
-            "expires_at": result["session"]["expires_at"].isoformat()
-        }),
-        media_type="application/json"
-    )
+    response = _token_response(result)
 
-    # Set session cookie
-    response.set_cookie(
-        key="platform_session",
-        value=result["session"]["token"],
-        httponly=True,
-        max_age=7 * 24 * 60 * 60,  # 7 days
-        samesite="lax",
-        secure=os.getenv("SECURE_COOKIES", "false").lower() == "true"
-    )
+    _set_session_cookie(response, result["session"]["token"])
 
     return response
 
@@ -136,24 +200,9 @@ async def login(request: UserLogin):
     if not result:
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
-    response = Response(
-        content=json.dumps({
-            "user": user_to_response(result["user"]),
-            "access_token": result["session"]["token"],
-            "expires_at": result["session"]["expires_at"].isoformat()
-        }),
-        media_type="application/json"
-    )
+    response = _token_response(result)
 
-    # Set session cookie
-    response.set_cookie(
-        key="platform_session",
-        value=result["session"]["token"],
-        httponly=True,
-        max_age=7 * 24 * 60 * 60,  # 7 days
-        samesite="lax",
-        secure=os.getenv("SECURE_COOKIES", "false").lower() == "true"
-    )
+    _set_session_cookie(response, result["session"]["token"])
 
     return response
 
@@ -161,19 +210,19 @@ async def login(request: UserLogin):
 @router.post("/auth/logout")
 async def logout(request: Request):
     """Log out the current user."""
-    token = request.cookies.get("platform_session")
+    token = request.cookies.get(SESSION_COOKIE_NAME)
     if token:
         await logout_user(token)
 
     response = Response(content=json.dumps({"status": "ok"}), media_type="application/json")
-    response.delete_cookie("platform_session")
+    response.delete_cookie(SESSION_COOKIE_NAME)
     return response
 
 
 @router.get("/auth/me")
 async def get_me(user: dict = Depends(require_user)):
     """Get the current user's info."""
-    return user_to_response(user)
+    return Response(content=user_to_response(user).model_dump_json(), media_type="application/json")
 
 
 @router.post("/auth/change-password")
@@ -182,7 +231,11 @@ async def change_user_password(
     user: dict = Depends(require_user)
 ):
     """Change the current user's password."""
-    if not verify_password(request.current_password, user["password_hash"], user["password_salt"]):
+    # The authenticated user view carries no password material
+    account = await get_user_by_id(str(user["_id"]))
+    if not account or not await asyncio.to_thread(
+        verify_password, request.current_password, account["password_hash"], account["password_salt"]
+    ):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
 
     await change_password(str(user["_id"]), request.new_password)
@@ -220,15 +273,16 @@ async def list_user_conversations(
     """List the current user's conversations."""
     conversations = await list_conversations(str(user["_id"]), skip, limit)
 
-    return [{
+    # orjson renders datetimes natively; preview is stored truncated
+    return ORJSONResponse([{
         "id": str(c["_id"]),
-        "user_id": c["user_id"],
+        "user_id": str(c["user_id"]),
         "title": c["title"],
-        "created_at": c["created_at"].isoformat(),
-        "updated_at": c["updated_at"].isoformat(),
+        "created_at": c["created_at"],
+        "updated_at": c["updated_at"],
         "message_count": c.get("message_count", 0),
-        "preview": c.get("preview", "")[:100] if c.get("preview") else None
-    } for c in conversations]
+        "preview": c.get("preview") or None
+    } for c in conversations])
 
 
 @router.get("/conversations/{conversation_id}")
@@ -237,14 +291,17 @@ async def get_user_conversation(
     user: dict = Depends(require_user)
 ):
     """Get a specific conversation with messages."""
-    conversation = await get_conversation(conversation_id, str(user["_id"]))
+    conversation, messages = await asyncio.gather(
+        get_conversation(conversation_id, str(user["_id"])),
+        get_conversation_messages(conversation_id)
+    )
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
     return {
         "id": str(conversation["_id"]),
-        "user_id": conversation["user_id"],
+        "user_id": str(conversation["user_id"]),
         "title": conversation["title"],
         "created_at": conversation["created_at"].isoformat(),
         "updated_at": conversation["updated_at"].isoformat(),
@@ -255,7 +312,7 @@ async def get_user_conversation(
             "thinking": m.get("thinking"),
             "sources": m.get("sources"),
             "metadata": m.get("metadata")
-        } for m in conversation.get("messages", [])]
+        } for m in messages]
     }
 
 
@@ -295,6 +352,29 @@ async def delete_user_conversation(
 
 # ============== Chat (Streaming) ==============
 
+def _collect_content(collected: dict, data: dict):
+    """Append a streamed answer chunk."""
+    collected["content"].append(data.get("text", ""))
+
+
+def _collect_thinking(collected: dict, data: dict):
+    """Append a reasoning step."""
+    collected["thinking"].append(data.get("content", "") + "\n")
+
+
+def _collect_sources(collected: dict, data: dict):
+    """Keep the final cited sources."""
+    collected["sources"] = data.get("sources", [])
+
+
+# Chat event type -> collector for the parts of the reply we persist
+_STREAM_COLLECTORS = {
+    "content": _collect_content,
+    "thinking": _collect_thinking,
+    "sources": _collect_sources,
+}
+
+
 @router.post("/chat")
 async def platform_chat(
     request: PlatformChatRequest,
@@ -326,6 +406,12 @@ async def platform_chat(
         conversation = await create_conversation(user_id)
         conversation_id = str(conversation["_id"])
 
+    # Build history from the conversation before adding the new message
+    history = await get_conversation_messages(
+        conversation_id,
+        projection={"_id": 0, "role": 1, "content": 1}
+    )
+
     # Add user message to conversation
     await add_message_to_conversation(
         conversation_id,
@@ -334,60 +420,31 @@ async def platform_chat(
         request.message
     )
 
-    # Build history from conversation
-    conversation = await get_conversation(conversation_id, user_id)
-    history = []
-    for msg in conversation.get("messages", [])[:-1]:  # Exclude the message we just added
-        history.append({
-            "role": msg["role"],
-            "content": msg["content"]
-        })
-
     # Get the streaming inferencer
     inferencer = get_streaming_inferencer()
 
     async def event_stream():
-        collected_content = ""
-        collected_thinking = ""
-        collected_sources = []
+        collected = {"content": [], "thinking": [], "sources": []}
 
         try:
             # Yield conversation ID first
             yield create_sse_event("conversation", {"id": conversation_id})
 
-            # Stream the chat response
-            for event in inferencer.chat_stream(
+            # Stream the chat response, collecting what we persist afterwards
+            for event_type, data in inferencer.chat_events(
                 message=request.message,
                 history=history,
                 max_iterations=10
             ):
-                yield event
-
-                # Parse the event to collect data
-                if event.startswith("event: content"):
-                    try:
-                        data_line = event.split("\n")[1]
-                        if data_line.startswith("data: "):
-                            data = json.loads(data_line[6:])
-                            collected_content += data.get("text", "")
-                    except:
-                        pass
-                elif event.startswith("event: thinking"):
-                    try:
-                        data_line = event.split("\n")[1]
-                        if data_line.startswith("data: "):
-                            data = json.loads(data_line[6:])
-                            collected_thinking += data.get("content", "") + "\n"
-                    except:
-                        pass
-                elif event.startswith("event: sources"):
-                    try:
-                        data_line = event.split("\n")[1]
-                        if data_line.startswith("data: "):
-                            data = json.loads(data_line[6:])
-                            collected_sources = data.get("sources", [])
-                    except:
-                        pass
+                yield create_sse_event(event_type, data)
+
+                collector = _STREAM_COLLECTORS.get(event_type)
+                if collector:
+                    collector(collected, data)
+
+            collected_content = "".join(collected["content"])
+            collected_thinking = "".join(collected["thinking"])
+            collected_sources = collected["sources"]
 
             # Save assistant response to conversation
             await add_message_to_conversation(
@@ -399,10 +456,10 @@ async def platform_chat(
                 sources=collected_sources if collected_sources else None
             )
 
-            # Auto-generate title if this is the first exchange
-            conv = await get_conversation(conversation_id, user_id)
-            if conv and len(conv.get("messages", [])) == 2 and conv["title"] == "New Conversation":
-                new_title = await generate_conversation_title(conversation_id, user_id)
+            # Auto-generate title if this is the first exchange; the first
+            # user message is the one we were just sent
+            if not history and conversation["title"] == "New Conversation":
+                new_title = conversation_title_from_message(request.message)
                 await update_conversation(conversation_id, user_id, {"title": new_title})
                 yield create_sse_event("title_update", {"title": new_title})
 
@@ -425,6 +482,7 @@ async def platform_chat(
 
 @router.get("/admin/users")
 async def admin_list_users(
+    http_request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     role: Optional[UserRole] = None,
@@ -432,17 +490,17 @@ async def admin_list_users(
     admin: dict = Depends(require_admin)
 ):
     """List all users (admin only)."""
-    users = await list_users(skip, limit, role, status)
-
-    return [{
+    rows = ({
         "id": str(u["_id"]),
         "username": u["username"],
         "email": u["email"],
         "role": u["role"],
         "status": u["status"],
-        "created_at": u["created_at"].isoformat(),
-        "last_login": u["last_login"].isoformat() if u.get("last_login") else None
-    } for u in users]
+        "created_at": u["created_at"],
+        "last_login": u.get("last_login")
+    } async for u in iter_users(skip, limit, role, status))
+
+    return _stream_rows(http_request, rows)
 
 
 @router.get("/admin/users/{user_id}")
@@ -539,26 +597,53 @@ async def admin_create_invite_code(
     }
 
 
+@router.post("/admin/invite-codes/bulk")
+async def admin_create_invite_codes_bulk(
+    request: InviteCodeBulkCreate,
+    admin: dict = Depends(require_admin)
+):
+    """Create a batch of invite codes (admin only)."""
+    codes = await create_invite_codes_bulk(
+        created_by=str(admin["_id"]),
+        count=request.count,
+        max_uses=request.max_uses,
+        expires_in_days=request.expires_in_days,
+        note=request.note
+    )
+
+    return ORJSONResponse([{
+        "code": c["code"],
+        "created_by": c["created_by"],
+        "created_at": c["created_at"],
+        "expires_at": c.get("expires_at"),
+        "max_uses": c["max_uses"],
+        "current_uses": c["current_uses"],
+        "note": c.get("note"),
+        "is_active": c["is_active"]
+    } for c in codes])
+
+
 @router.get("/admin/invite-codes")
 async def admin_list_invite_codes(
+    http_request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     active_only: bool = Query(False),
     admin: dict = Depends(require_admin)
 ):
     """List all invite codes (admin only)."""
-    codes = await list_invite_codes(active_only=active_only, skip=skip, limit=limit)
-
-    return [{
+    rows = ({
         "code": c["code"],
         "created_by": c["created_by"],
-        "created_at": c["created_at"].isoformat(),
-        "expires_at": c["expires_at"].isoformat() if c.get("expires_at") else None,
+        "created_at": c["created_at"],
+        "expires_at": c.get("expires_at"),
         "max_uses": c["max_uses"],
         "current_uses": c["current_uses"],
         "note": c.get("note"),
         "is_active": c["is_active"]
-    } for c in codes]
+    } async for c in iter_invite_codes(active_only=active_only, skip=skip, limit=limit))
+
+    return _stream_rows(http_request, rows)
 
 
 @router.delete("/admin/invite-codes/{code}")
@@ -582,24 +667,20 @@ async def admin_get_stats(admin: dict = Depends(require_admin)):
     today = now.replace(hour=0, minute=0, second=0, microsecond=0)
     week_ago = today - timedelta(days=7)
 
-    total_users = await count_users()
-    active_users = await count_users(status=UserStatus.ACTIVE)
-    suspended_users = await count_users(status=UserStatus.SUSPENDED)
+    user_counts = await count_users_facets(today, week_ago)
     total_conversations = await count_conversations()
     total_messages = await count_messages()
     active_invite_codes = await count_active_invite_codes()
-    users_today = await count_users(since=today)
-    users_this_week = await count_users(since=week_ago)
 
     return {
-        "total_users": total_users,
-        "active_users": active_users,
-        "suspended_users": suspended_users,
+        "total_users": user_counts["total"],
+        "active_users": user_counts["active"],
+        "suspended_users": user_counts["suspended"],
         "total_conversations": total_conversations,
         "total_messages": total_messages,
         "active_invite_codes": active_invite_codes,
-        "users_registered_today": users_today,
-        "users_registered_this_week": users_this_week
+        "users_registered_today": user_counts["today"],
+        "users_registered_this_week": user_counts["week"]
     }
 
 
@@ -607,10 +688,15 @@ async def admin_get_stats(admin: dict = Depends(require_admin)):
 
 import redis
 
+_redis_client: Optional[redis.Redis] = None
+
+
 def get_redis():
-    """Get Redis connection."""
-    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-    return redis.from_url(redis_url, decode_responses=True)
+    """Get the shared Redis connection."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+    return _redis_client
 
 
 @router.get("/admin/settings")
@@ -634,17 +720,17 @@ async def admin_get_settings(admin: dict = Depends(require_admin)):
         "max_messages_per_conversation": int(r.get("discord_rag:settings:max_messages") or 500),
 
         # Discord settings (read-only, from env)
-        "discord_bot_token_set": bool(os.getenv("DISCORD_BOT_TOKEN")),
-        "discord_bot_client_id": os.getenv("DISCORD_BOT_CLIENT_ID", ""),
-        "discord_channel_ids": os.getenv("DISCORD_CHANNEL_IDS", "").split(",") if os.getenv("DISCORD_CHANNEL_IDS") else [],
+        "discord_bot_token_set": DISCORD_BOT_TOKEN_SET,
+        "discord_bot_client_id": DISCORD_BOT_CLIENT_ID,
+        "discord_channel_ids": list(DISCORD_CHANNEL_IDS_ENV),
 
         # Scheduler settings
-        "schedule_cron": os.getenv("SCHEDULE_CRON", "0 3 * * *"),
-        "quiet_period_minutes": int(os.getenv("QUIET_PERIOD_MINUTES", 15)),
-        "backoff_minutes": int(os.getenv("BACKOFF_MINUTES", 10)),
+        "schedule_cron": SCHEDULE_CRON_DEFAULT,
+        "quiet_period_minutes": QUIET_PERIOD_MINUTES_DEFAULT,
+        "backoff_minutes": BACKOFF_MINUTES_DEFAULT,
 
         # API settings
-        "api_key_set": bool(os.getenv("API_KEY")),
+        "api_key_set": API_KEY_SET,
     }
 
     return settings
@@ -694,31 +780,38 @@ async def admin_update_platform_settings(
     admin: dict = Depends(require_admin)
 ):
     """Update platform settings (admin only)."""
-    r = get_redis()
+    # Validate everything first, then write all settings in one command
+    updates = {}
 
     if registration_enabled is not None:
-        r.set("discord_rag:settings:registration_enabled", "true" if registration_enabled else "false")
+        updates["discord_rag:settings:registration_enabled"] = "true" if registration_enabled else "false"
 
     if max_conversations_per_user is not None:
         if max_conversations_per_user < 1 or max_conversations_per_user > 10000:
             raise HTTPException(status_code=400, detail="max_conversations must be between 1 and 10000")
-        r.set("discord_rag:settings:max_conversations", str(max_conversations_per_user))
+        updates["discord_rag:settings:max_conversations"] = str(max_conversations_per_user)
 
     if max_messages_per_conversation is not None:
         if max_messages_per_conversation < 1 or max_messages_per_conversation > 10000:
             raise HTTPException(status_code=400, detail="max_messages must be between 1 and 10000")
-        r.set("discord_rag:settings:max_messages", str(max_messages_per_conversation))
+        updates["discord_rag:settings:max_messages"] = str(max_messages_per_conversation)
+
+    if updates:
+        get_redis().mset(updates)
 
     return {"status": "ok"}
 
 
 # ============== Admin: Indexing Control ==============
 
+# Strong references to fire-and-forget tasks so they aren't garbage collected
+_background_tasks: set = set()
+
+
 @router.post("/admin/indexing/run")
 async def admin_run_indexing(admin: dict = Depends(require_admin)):
     """Trigger the indexing pipeline (admin only)."""
     from dashboard import indexing_status, _run_indexing_pipeline
-    import threading
 
     if indexing_status["running"]:
         return {
@@ -727,9 +820,14 @@ async def admin_run_indexing(admin: dict = Depends(require_admin)):
             "started_at": indexing_status["last_run"]
         }
 
-    # Start indexing in background thread
-    thread = threading.Thread(target=_run_indexing_pipeline, daemon=True)
-    thread.start()
+    # Claim the flag before yielding to the loop so a concurrent request
+    # can't also see running=False and start a second pipeline
+    indexing_status["running"] = True
+
+    # Run the blocking pipeline in the default executor, tracked by the loop
+    task = asyncio.create_task(asyncio.to_thread(_run_indexing_pipeline))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
     return {
         "status": "started",
@@ -749,8 +847,6 @@ async def admin_get_index_stats(admin: dict = Depends(require_admin)):
     """Get vector index statistics (admin only)."""
     from utils.vector_store import check_index_status, INDEX_NAME
 
-    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-
     # Get vector index status
     index_status = check_index_status()
 
@@ -763,11 +859,12 @@ async def admin_get_index_stats(admin: dict = Depends(require_admin)):
     last_indexed = None
 
     try:
-        r = redis.from_url(redis_url, decode_responses=True)
-        # Find all guild stats keys
-        guild_keys = r.keys("discord_rag:guild:*:stats")
-        for key in guild_keys:
-            stats = r.hgetall(key)
+        r = get_redis()
+        # Find all guild stats keys and fetch them in one round-trip
+        pipe = r.pipeline(transaction=False)
+        for key in r.scan_iter(match="discord_rag:guild:*:stats", count=500):
+            pipe.hgetall(key)
+        for stats in pipe.execute():
             total_messages += int(stats.get("total_messages", 0))
             indexed_channels += int(stats.get("indexed_channels", 0))
 
@@ -819,6 +916,7 @@ async def admin_get_query_stats(admin: dict = Depends(require_admin)):
             "queries_this_week": stats.queries_this_week,
             "queries_this_month": stats.queries_this_month,
             "avg_response_time_ms": stats.avg_response_time_ms,
+            "avg_response_time": f"{stats.avg_response_time_ms:.0f}ms",
             "avg_sources_per_query": stats.avg_sources_per_query,
             "error_count": stats.error_count,
             "last_query_time": stats.last_query_time,
@@ -849,17 +947,16 @@ async def admin_get_discord_settings(admin: dict = Depends(require_admin)):
     if channel_ids_redis:
         channel_ids = [c.strip() for c in channel_ids_redis.split(",") if c.strip()]
     else:
-        channel_ids_env = os.getenv("DISCORD_CHANNEL_IDS", "")
-        channel_ids = [c.strip() for c in channel_ids_env.split(",") if c.strip()]
+        channel_ids = list(DISCORD_CHANNEL_IDS_ENV)
 
     # Get scheduler settings from Redis (or env defaults)
-    schedule_cron = r.get("discord_rag:settings:schedule_cron") or os.getenv("SCHEDULE_CRON", "0 3 * * *")
-    quiet_period = r.get("discord_rag:settings:quiet_period_minutes") or os.getenv("QUIET_PERIOD_MINUTES", "15")
-    backoff = r.get("discord_rag:settings:backoff_minutes") or os.getenv("BACKOFF_MINUTES", "10")
+    schedule_cron = r.get("discord_rag:settings:schedule_cron") or SCHEDULE_CRON_DEFAULT
+    quiet_period = r.get("discord_rag:settings:quiet_period_minutes") or QUIET_PERIOD_MINUTES_DEFAULT
+    backoff = r.get("discord_rag:settings:backoff_minutes") or BACKOFF_MINUTES_DEFAULT
 
     return {
-        "bot_token_set": bool(os.getenv("DISCORD_BOT_TOKEN")),
-        "bot_client_id": os.getenv("DISCORD_BOT_CLIENT_ID", ""),
+        "bot_token_set": DISCORD_BOT_TOKEN_SET,
+        "bot_client_id": DISCORD_BOT_CLIENT_ID,
         "channel_ids": channel_ids,
         "schedule_cron": schedule_cron,
         "quiet_period_minutes": int(quiet_period),
@@ -894,27 +991,31 @@ async def admin_update_scheduler_settings(
     admin: dict = Depends(require_admin)
 ):
     """Update scheduler settings (admin only)."""
-    r = get_redis()
+    # Validate everything first, then write all settings in one command
+    updates = {}
 
     if schedule_cron is not None:
         # Basic validation of cron expression (5 parts)
         parts = schedule_cron.strip().split()
         if len(parts) != 5:
             raise HTTPException(status_code=400, detail="Invalid cron expression. Must have 5 parts.")
-        r.set("discord_rag:settings:schedule_cron", schedule_cron.strip())
+        updates["discord_rag:settings:schedule_cron"] = schedule_cron.strip()
 
     if quiet_period_minutes is not None:
         if quiet_period_minutes < 0 or quiet_period_minutes > 1440:
             raise HTTPException(status_code=400, detail="quiet_period_minutes must be between 0 and 1440")
-        r.set("discord_rag:settings:quiet_period_minutes", str(quiet_period_minutes))
+        updates["discord_rag:settings:quiet_period_minutes"] = str(quiet_period_minutes)
 
     if backoff_minutes is not None:
         if backoff_minutes < 0 or backoff_minutes > 1440:
             raise HTTPException(status_code=400, detail="backoff_minutes must be between 0 and 1440")
-        r.set("discord_rag:settings:backoff_minutes", str(backoff_minutes))
+        updates["discord_rag:settings:backoff_minutes"] = str(backoff_minutes)
 
     if auto_ingest_enabled is not None:
-        r.set("discord_rag:settings:auto_ingest_enabled", "true" if auto_ingest_enabled else "false")
+        updates["discord_rag:settings:auto_ingest_enabled"] = "true" if auto_ingest_enabled else "false"
+
+    if updates:
+        get_redis().mset(updates)
 
     return {"status": "ok"}
 
@@ -928,20 +1029,20 @@ async def admin_trigger_ingestion(
     r = get_redis()
 
     # Queue an ingestion job
-    import json
     from datetime import datetime
 
-    job_id = f"manual_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+    now = datetime.utcnow()
+    job_id = f"manual_{now.strftime('%Y%m%d_%H%M%S')}"
     job_data = {
         "job_id": job_id,
         "type": "ingest",
-        "channel_id": channel_id,
+        "channel_id": channel_id or "",
         "triggered_by": admin.get("username", "admin"),
-        "triggered_at": datetime.utcnow().isoformat(),
+        "triggered_at": now.isoformat(),
     }
 
-    # Push to ingestion queue
-    r.lpush("discord_rag:ingest_queue", json.dumps(job_data))
+    # Append to the ingestion stream; the scheduler consumes it as a group
+    r.xadd(INGEST_STREAM_KEY, job_data, maxlen=INGEST_STREAM_MAXLEN, approximate=True)
 
     return {
         "status": "queued",
@@ -958,33 +1059,49 @@ async def admin_get_ingestion_jobs(
     """Get recent ingestion jobs (admin only)."""
     r = get_redis()
 
-    # Get job history from Redis
-    jobs = []
-    job_keys = r.keys("discord_rag:job:*")
+    # Newest jobs come from the scheduler's time-ordered index, which it
+    # backfills with older jobs on startup; until it has, fall back to SCAN
+    # (never the blocking KEYS)
+    job_keys = r.zrevrange("discord_rag:jobs_index", 0, limit - 1)
+    if not job_keys:
+        job_keys = sorted(r.scan_iter(match="discord_rag:job:*", count=500), reverse=True)[:limit]
 
-    for key in sorted(job_keys, reverse=True)[:limit]:
-        job_data = r.hgetall(key)
-        if job_data:
-            jobs.append(job_data)
+    # Fetch every job hash in a single round-trip
+    pipe = r.pipeline(transaction=False)
+    for key in job_keys:
+        pipe.hgetall(key)
+    jobs = [job_data for job_data in pipe.execute() if job_data]
 
     return {"jobs": jobs}
 
 
 @router.get("/admin/discord/guilds")
 async def admin_get_indexed_guilds(admin: dict = Depends(require_admin)):
-    """Get all indexed guilds with stats (admin only)."""
-    r = get_redis()
+    """Get all indexed guilds with stats (admin only).
 
-    guilds = []
-    guild_keys = r.keys("discord_rag:guild:*:stats")
-
-    for key in guild_keys:
-        guild_id = key.split(":")[2]
-        stats = r.hgetall(key)
+    The serialized response is cached briefly; ingestion drops the cache when
+    it updates guild stats.
+    """
+    r = get_redis()
 
-        # Try to get guild metadata if available
-        guild_meta = r.hgetall(f"discord_rag:guild:{guild_id}:meta")
+    cached = r.get(GUILDS_CACHE_KEY)
+    if cached:
+        return Response(content=cached, media_type="application/json")
 
+    guilds = []
+    guild_ids = [
+        key.split(":")[2]
+        for key in r.scan_iter(match="discord_rag:guild:*:stats", count=500)
+    ]
+
+    # Fetch stats and metadata for every guild in a single round-trip
+    pipe = r.pipeline(transaction=False)
+    for guild_id in guild_ids:
+        pipe.hgetall(f"discord_rag:guild:{guild_id}:stats")
+        pipe.hgetall(f"discord_rag:guild:{guild_id}:meta")
+    results = pipe.execute()
+
+    for guild_id, stats, guild_meta in zip(guild_ids, results[0::2], results[1::2]):
         guilds.append({
             "guild_id": guild_id,
             "guild_name": guild_meta.get("name", "Unknown"),
@@ -997,7 +1114,9 @@ async def admin_get_indexed_guilds(admin: dict = Depends(require_admin)):
             "last_indexed": stats.get("last_indexed"),
         })
 
-    return {"guilds": guilds}
+    content = orjson.dumps({"guilds": guilds})
+    r.setex(GUILDS_CACHE_KEY, GUILDS_CACHE_TTL, content)
+    return Response(content=content, media_type="application/json")
 
 
 # ============== Discord Bot Invite & Permissions ==============
@@ -1060,7 +1179,7 @@ def calculate_permissions(permission_names: List[str]) -> int:
 @router.get("/admin/discord/invite")
 async def admin_get_invite_info(admin: dict = Depends(require_admin)):
     """Get Discord bot invite link generation info (admin only)."""
-    client_id = os.getenv("DISCORD_BOT_CLIENT_ID", "")
+    client_id = DISCORD_BOT_CLIENT_ID
 
     if not client_id:
         return {
@@ -1085,7 +1204,7 @@ async def admin_generate_invite_link(
     admin: dict = Depends(require_admin)
 ):
     """Generate a Discord bot invite link with specified permissions (admin only)."""
-    client_id = os.getenv("DISCORD_BOT_CLIENT_ID", "")
+    client_id = DISCORD_BOT_CLIENT_ID
 
     if not client_id:
         raise HTTPException(status_code=400, detail="DISCORD_BOT_CLIENT_ID not configured")
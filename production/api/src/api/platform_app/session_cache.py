@@ -0,0 +1,111 @@
+"""
+Redis-backed cache for session lookups.
+
+Maps a session token to the authenticated user document so that steady-state
+requests skip MongoDB. Entries are BSON-encoded (ObjectId and datetime values
+survive the round-trip) and expire after a short TTL. The cache is optional:
+any Redis failure falls back to the database.
+
+An optional per-process layer can sit in front of Redis so repeat requests on
+the same worker skip the Redis round-trip too. It is off by default
+(SESSION_CACHE_LOCAL_TTL=0): invalidations only clear it on the worker that
+makes them, so with it enabled every other worker keeps accepting a logged-out,
+suspended or demoted session for up to SESSION_CACHE_LOCAL_TTL seconds.
+"""
+import os
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any, Iterable
+
+import bson
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+SESSION_CACHE_TTL = int(os.getenv("SESSION_CACHE_TTL", 60))
+SESSION_CACHE_LOCAL_TTL = float(os.getenv("SESSION_CACHE_LOCAL_TTL", 0))
+SESSION_CACHE_LOCAL_SIZE = 1024
+SESSION_CACHE_PREFIX = "discord_rag:session_cache:"
+
+_redis: Optional[aioredis.Redis] = None
+
+# token -> (monotonic expiry, BSON-encoded user), least recently used first
+_local: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+
+
+def _get_redis() -> aioredis.Redis:
+    """Get or create the async Redis connection."""
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(REDIS_URL)
+    return _redis
+
+
+def _local_get(token: str) -> Optional[bytes]:
+    """Get a fresh entry from the in-process cache."""
+    entry = _local.get(token)
+    if entry is None:
+        return None
+    if entry[0] < time.monotonic():
+        del _local[token]
+        return None
+    _local.move_to_end(token)
+    return entry[1]
+
+
+def _local_set(token: str, data: bytes, ttl: float):
+    """Store an entry in the in-process cache, evicting the oldest if full."""
+    ttl = min(ttl, SESSION_CACHE_LOCAL_TTL)
+    if ttl <= 0:
+        return
+    _local[token] = (time.monotonic() + ttl, data)
+    _local.move_to_end(token)
+    while len(_local) > SESSION_CACHE_LOCAL_SIZE:
+        _local.popitem(last=False)
+
+
+async def get_cached_user(token: str) -> Optional[Dict[str, Any]]:
+    """Get the cached user for a session token."""
+    data = _local_get(token)
+    if data is None:
+        try:
+            data = await _get_redis().get(SESSION_CACHE_PREFIX + token)
+        except Exception as e:
+            logger.debug(f"Session cache read failed: {e}")
+            return None
+        if not data:
+            return None
+        _local_set(token, data, SESSION_CACHE_LOCAL_TTL)
+    return bson.decode(data)
+
+
+async def cache_user(token: str, user: Dict[str, Any], expires_at: Optional[datetime] = None):
+    """Cache the user for a session token, never outliving the session."""
+    ttl = SESSION_CACHE_TTL
+    if expires_at is not None:
+        ttl = min(ttl, int((expires_at - datetime.utcnow()).total_seconds()))
+    if ttl <= 0:
+        return
+    data = bson.encode(user)
+    _local_set(token, data, ttl)
+    try:
+        await _get_redis().set(SESSION_CACHE_PREFIX + token, data, ex=ttl)
+    except Exception as e:
+        logger.debug(f"Session cache write failed: {e}")
+
+
+async def invalidate_sessions(tokens: Iterable[str]):
+    """Drop cached entries for the given session tokens."""
+    tokens = list(tokens)
+    for token in tokens:
+        _local.pop(token, None)
+    keys = [SESSION_CACHE_PREFIX + token for token in tokens]
+    if not keys:
+        return
+    try:
+        await _get_redis().delete(*keys)
+    except Exception as e:
+        logger.warning(f"Session cache invalidation failed: {e}")
@@ -3,11 +3,16 @@ Usage statistics tracking for the Discord RAG API.
 Stores stats in Redis for persistence across restarts.
 """
 import os
-import json
+import time
+import asyncio
+import logging
 import redis
+import orjson
 from datetime import datetime, timedelta
 from typing import Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -27,118 +32,237 @@ class QueryStats:
             self.top_hours = {}
 
 
+# Per-period query counters: (name, key date format, expiry)
+PERIOD_BUCKETS = (
+    ("day", "%Y%m%d", timedelta(days=40)),
+    ("week", "%G%V", timedelta(weeks=10)),
+    ("month", "%Y%m", timedelta(days=400)),
+)
+
+# Per-hour query counters behind the recent-activity histogram
+HOUR_BUCKET = ("hour", "%Y%m%d%H", timedelta(days=2))
+RECENT_HOURS = 24
+
+
 class StatsTracker:
-    """Tracks API usage statistics using Redis."""
+    """Tracks API usage statistics using Redis.
+
+    Stats are kept in memory and written back to Redis every
+    FLUSH_EVERY queries or FLUSH_INTERVAL_SECONDS, whichever comes first;
+    the interval is enforced by flush_periodically even when no queries arrive.
+    Every shared value is a counter or sum applied with INCRBY/HINCRBY/
+    HINCRBYFLOAT, so several workers can add to them without overwriting
+    each other; averages are derived from the sums when read.
+    """
 
-    STATS_KEY = "discord_rag:stats"
+    STATS_KEY = "discord_rag:stats"  # Legacy blob, only read to seed the counters
     QUERIES_KEY = "discord_rag:queries"
     HOURLY_KEY = "discord_rag:hourly"
+    TOTAL_KEY = "discord_rag:total_queries"
+    ERRORS_KEY = "discord_rag:error_count"
+    TOP_HOURS_KEY = "discord_rag:top_hours"
+    SUMS_KEY = "discord_rag:query_sums"
+
+    FLUSH_EVERY = 20
+    FLUSH_INTERVAL_SECONDS = 5
 
     def __init__(self):
         redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
         self.redis = redis.from_url(redis_url, decode_responses=True)
-        self._ensure_stats_exist()
-
-    def _ensure_stats_exist(self):
-        """Initialize stats if they don't exist."""
-        if not self.redis.exists(self.STATS_KEY):
-            self._save_stats(QueryStats())
+        self._seed_counters(self._get_stats())
+        self._pending_queries: dict = {}
+        self._pending_total = 0
+        self._pending_response_ms = 0.0
+        self._pending_sources = 0
+        self._pending_errors = 0
+        self._pending_hours: dict = {}
+        self._pending_periods: dict = {}
+        self._last_flush = time.monotonic()
 
     def _get_stats(self) -> QueryStats:
-        """Load stats from Redis."""
+        """Load the legacy stats blob from Redis."""
         data = self.redis.get(self.STATS_KEY)
         if data:
-            parsed = json.loads(data)
+            parsed = orjson.loads(data)
             return QueryStats(**parsed)
         return QueryStats()
 
-    def _save_stats(self, stats: QueryStats):
-        """Save stats to Redis."""
-        self.redis.set(self.STATS_KEY, json.dumps(asdict(stats)))
+    def _seed_counters(self, stats: QueryStats):
+        """Copy counters from a stats blob written before they moved to their own keys."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.setnx(self.TOTAL_KEY, stats.total_queries)
+        pipe.setnx(self.ERRORS_KEY, stats.error_count)
+        pipe.hsetnx(self.SUMS_KEY, "response_time_ms", stats.avg_response_time_ms * stats.total_queries)
+        pipe.hsetnx(self.SUMS_KEY, "sources", stats.avg_sources_per_query * stats.total_queries)
+        for hour, count in stats.top_hours.items():
+            pipe.hsetnx(self.TOP_HOURS_KEY, hour, count)
+        pipe.execute()
+
+        # Backfill the current period counters from the query timestamps
+        now = datetime.utcnow()
+        pipe = self.redis.pipeline(transaction=False)
+        for start in self._period_starts(now):
+            pipe.zcount(self.QUERIES_KEY, start.timestamp(), "+inf")
+        counts = pipe.execute()
+
+        pipe = self.redis.pipeline(transaction=False)
+        for (name, fmt, ttl), count in zip(PERIOD_BUCKETS, counts):
+            pipe.set(self._period_key(name, fmt, now), count, nx=True, ex=ttl)
+        pipe.execute()
+
+        # Same for the hours shown in the recent-activity histogram
+        name, fmt, ttl = HOUR_BUCKET
+        hour_starts = self._hour_starts(now, RECENT_HOURS)
+        pipe = self.redis.pipeline(transaction=False)
+        for start in hour_starts:
+            end = (start + timedelta(hours=1)).timestamp()
+            pipe.zcount(self.QUERIES_KEY, start.timestamp(), f"({end}")
+        counts = pipe.execute()
+
+        pipe = self.redis.pipeline(transaction=False)
+        for start, count in zip(hour_starts, counts):
+            pipe.set(self._period_key(name, fmt, start), count, nx=True, ex=ttl)
+        pipe.execute()
+
+    def _period_key(self, name: str, fmt: str, when: datetime) -> str:
+        """Redis key counting the queries in the period containing `when`."""
+        return f"{self.QUERIES_KEY}:{name}:{when.strftime(fmt)}"
+
+    def _period_starts(self, now: datetime) -> tuple:
+        """Start of the current day, week and month."""
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        week_start = today_start - timedelta(days=now.weekday())
+        month_start = today_start.replace(day=1)
+        return today_start, week_start, month_start
+
+    def _hour_starts(self, now: datetime, hours: int) -> list:
+        """Starts of the last N clock hours, oldest first, ending with the current one."""
+        current = now.replace(minute=0, second=0, microsecond=0)
+        return [current - timedelta(hours=i) for i in range(hours - 1, -1, -1)]
 
     def record_query(self, response_time_ms: float, sources_count: int, success: bool = True):
         """Record a query execution."""
-        stats = self._get_stats()
         now = datetime.utcnow()
         hour_key = now.strftime("%H")
 
         # Update totals
-        stats.total_queries += 1
-        stats.last_query_time = now.isoformat()
+        self._pending_total += 1
+        self._pending_response_ms += response_time_ms
+        self._pending_sources += sources_count
 
         if not success:
-            stats.error_count += 1
+            self._pending_errors += 1
 
         # Update hourly distribution
-        if stats.top_hours is None:
-            stats.top_hours = {}
-        stats.top_hours[hour_key] = stats.top_hours.get(hour_key, 0) + 1
-
-        # Update rolling averages
-        n = stats.total_queries
-        stats.avg_response_time_ms = (
-            (stats.avg_response_time_ms * (n - 1) + response_time_ms) / n
-        )
-        stats.avg_sources_per_query = (
-            (stats.avg_sources_per_query * (n - 1) + sources_count) / n
-        )
+        self._pending_hours[hour_key] = self._pending_hours.get(hour_key, 0) + 1
 
         # Record timestamp for time-based queries
-        self.redis.zadd(self.QUERIES_KEY, {now.isoformat(): now.timestamp()})
+        self._pending_queries[now.isoformat()] = now.timestamp()
+        for name, fmt, ttl in PERIOD_BUCKETS + (HOUR_BUCKET,):
+            key = (self._period_key(name, fmt, now), ttl)
+            self._pending_periods[key] = self._pending_periods.get(key, 0) + 1
+
+        if (self._pending_total >= self.FLUSH_EVERY
+                or time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL_SECONDS):
+            self.flush()
+
+    def flush(self):
+        """Add pending counts and query timestamps to the shared Redis counters."""
+        now = datetime.utcnow()
+
+        # Send every write in one round trip
+        pipe = self.redis.pipeline(transaction=False)
+
+        if self._pending_total:
+            pipe.incrby(self.TOTAL_KEY, self._pending_total)
+            pipe.hincrbyfloat(self.SUMS_KEY, "response_time_ms", self._pending_response_ms)
+            pipe.hincrbyfloat(self.SUMS_KEY, "sources", self._pending_sources)
+        if self._pending_errors:
+            pipe.incrby(self.ERRORS_KEY, self._pending_errors)
+        for hour, count in self._pending_hours.items():
+            pipe.hincrby(self.TOP_HOURS_KEY, hour, count)
+        for (key, ttl), count in self._pending_periods.items():
+            pipe.incrby(key, count)
+            pipe.expire(key, ttl)
+
+        if self._pending_queries:
+            pipe.zadd(self.QUERIES_KEY, self._pending_queries)
 
         # Clean up old entries (keep last 30 days)
         cutoff = (now - timedelta(days=30)).timestamp()
-        self.redis.zremrangebyscore(self.QUERIES_KEY, "-inf", cutoff)
+        pipe.zremrangebyscore(self.QUERIES_KEY, "-inf", cutoff)
+
+        pipe.execute()
 
-        self._save_stats(stats)
+        self._pending_queries = {}
+        self._pending_total = 0
+        self._pending_response_ms = 0.0
+        self._pending_sources = 0
+        self._pending_errors = 0
+        self._pending_hours = {}
+        self._pending_periods = {}
+        self._last_flush = time.monotonic()
 
     def get_stats(self) -> QueryStats:
         """Get current statistics."""
-        stats = self._get_stats()
+        if self._pending_total:
+            self.flush()
+        stats = QueryStats()
         now = datetime.utcnow()
 
-        # Calculate time-based counts
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_start = today_start - timedelta(days=now.weekday())
-        month_start = today_start.replace(day=1)
+        # Time-based counts come from the maintained period counters
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(self.TOTAL_KEY)
+        pipe.get(self.ERRORS_KEY)
+        pipe.hgetall(self.TOP_HOURS_KEY)
+        pipe.mget([self._period_key(name, fmt, now) for name, fmt, _ in PERIOD_BUCKETS])
+        pipe.hmget(self.SUMS_KEY, ["response_time_ms", "sources"])
+        pipe.zrevrange(self.QUERIES_KEY, 0, 0)
+        total, errors, top_hours, periods, sums, latest = pipe.execute()
 
-        stats.queries_today = self.redis.zcount(
-            self.QUERIES_KEY, today_start.timestamp(), "+inf"
-        )
-        stats.queries_this_week = self.redis.zcount(
-            self.QUERIES_KEY, week_start.timestamp(), "+inf"
-        )
-        stats.queries_this_month = self.redis.zcount(
-            self.QUERIES_KEY, month_start.timestamp(), "+inf"
+        stats.total_queries = int(total or 0)
+        if stats.total_queries:
+            response_ms_sum, sources_sum = (float(value or 0) for value in sums)
+            stats.avg_response_time_ms = response_ms_sum / stats.total_queries
+            stats.avg_sources_per_query = sources_sum / stats.total_queries
+        # Query timestamps are stored as their ISO strings, scored by time
+        stats.last_query_time = latest[0] if latest else None
+        stats.error_count = int(errors or 0)
+        stats.top_hours = {hour: int(count) for hour, count in top_hours.items()}
+        stats.queries_today, stats.queries_this_week, stats.queries_this_month = (
+            int(count or 0) for count in periods
         )
 
         return stats
 
-    def get_recent_queries_count(self, hours: int = 24) -> list:
-        """Get query counts per hour for the last N hours."""
-        now = datetime.utcnow()
-        hourly_counts = []
-
-        for i in range(hours, 0, -1):
-            hour_start = now - timedelta(hours=i)
-            hour_end = now - timedelta(hours=i-1)
-            count = self.redis.zcount(
-                self.QUERIES_KEY,
-                hour_start.timestamp(),
-                hour_end.timestamp()
-            )
-            hourly_counts.append({
-                "hour": hour_start.strftime("%H:%M"),
-                "count": count
-            })
-
-        return hourly_counts
+    def get_recent_queries_count(self, hours: int = RECENT_HOURS) -> list:
+        """Get query counts per clock hour for the last N hours (up to two days)."""
+        if self._pending_total:
+            self.flush()
+        name, fmt, _ = HOUR_BUCKET
+        hour_starts = self._hour_starts(datetime.utcnow(), hours)
+        counts = self.redis.mget([self._period_key(name, fmt, start) for start in hour_starts])
+
+        return [
+            {"hour": start.strftime("%H:%M"), "count": int(count or 0)}
+            for start, count in zip(hour_starts, counts)
+        ]
 
     def reset_stats(self):
         """Reset all statistics."""
-        self.redis.delete(self.STATS_KEY)
-        self.redis.delete(self.QUERIES_KEY)
-        self._ensure_stats_exist()
+        self.redis.delete(
+            self.STATS_KEY, self.QUERIES_KEY, self.TOTAL_KEY,
+            self.ERRORS_KEY, self.TOP_HOURS_KEY, self.SUMS_KEY,
+        )
+        for key in self.redis.scan_iter(f"{self.QUERIES_KEY}:*"):
+            self.redis.delete(key)
+        self._pending_queries = {}
+        self._pending_periods = {}
+        self._pending_total = 0
+        self._pending_response_ms = 0.0
+        self._pending_sources = 0
+        self._pending_errors = 0
+        self._pending_hours = {}
 
 
 # Global instance
@@ -151,3 +275,21 @@ def get_stats_tracker() -> StatsTracker:
     if _tracker is None:
         _tracker = StatsTracker()
     return _tracker
+
+
+def flush_stats_tracker():
+    """Flush the global stats tracker, if one was ever created."""
+    if _tracker is None:
+        return
+    try:
+        _tracker.flush()
+    except Exception as e:
+        logger.error(f"Failed to flush query stats: {e}")
+
+
+async def flush_periodically():
+    """Flush pending stats every FLUSH_INTERVAL_SECONDS until cancelled."""
+    while True:
+        await asyncio.sleep(StatsTracker.FLUSH_INTERVAL_SECONDS)
+        if _tracker is not None and _tracker._pending_total:
+            flush_stats_tracker()
@@ -6,19 +6,55 @@ and may result in account termination. Use at your own risk.
 """
 import os
 import json
+import time
+import calendar
 import httpx
+import orjson
 import asyncio
 import logging
 import redis
-from typing import Optional, List, Dict, Any
+import hashlib
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError
 
 logger = logging.getLogger(__name__)
 
 DISCORD_API_BASE = "https://discord.com/api/v10"
 MAX_MESSAGES_PER_REQUEST = 100
 RATE_LIMIT_DELAY = 1.0  # seconds between requests to avoid rate limits
+RATE_LIMIT_MAX_RETRIES = 5  # 429 responses tolerated for one page before giving up
+DUPLICATE_KEY_ERROR = 11000
+UPSERT_QUEUE_SIZE = 4  # converted batches allowed to wait for MongoDB while fetching continues
+
+# (token fingerprint, channel_id) -> (fetch time, channel data), least recently used first.
+# Keyed per token so one user's access never answers for another's.
+_channel_info_cache: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+CHANNEL_INFO_TTL_SECONDS = 300  # 5 minutes
+CHANNEL_INFO_CACHE_SIZE = 256
+
+# Message collections whose indexes were already ensured by this process
+_indexed_collections: set = set()
+
+
+def _parse_discord_timestamp(ts: str) -> int:
+    """Convert a Discord ISO 8601 timestamp to epoch milliseconds.
+
+    Discord always sends UTC as "YYYY-MM-DDTHH:MM:SS[.ffffff]+00:00", so the
+    digits are read by position; anything else goes through fromisoformat.
+    """
+    if len(ts) >= 25 and ts.endswith("+00:00"):
+        seconds = calendar.timegm((
+            int(ts[0:4]), int(ts[5:7]), int(ts[8:10]),
+            int(ts[11:13]), int(ts[14:16]), int(ts[17:19]), 0, 0, 0
+        ))
+        millis = int(ts[20:23]) if ts[19] == "." else 0
+        return seconds * 1000 + millis
+    dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    return int(dt.timestamp() * 1000)
 
 
 class UserTokenImporter:
@@ -26,12 +62,18 @@ class UserTokenImporter:
 
     def __init__(self, user_token: str, mongodb_url: str = None, db_name: str = None, collection_name: str = None):
         self.user_token = user_token
+        self._token_fingerprint = hashlib.sha256(user_token.encode()).hexdigest()
+        # Only GETs are sent, so there is no body to describe with Content-Type
         self.headers = {
             "Authorization": user_token,  # No "Bot " prefix for user tokens
-            "Content-Type": "application/json",
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         }
 
+        # One client for every Discord API call so the connection is reused
+        self.http = httpx.AsyncClient(headers=self.headers, base_url=DISCORD_API_BASE, timeout=30.0)
+        # Monotonic time before which the messages bucket is known to be exhausted
+        self._rate_limit_reset_at = 0.0
+
         # MongoDB setup
         mongodb_url = mongodb_url or os.getenv("MONGODB_URL", "mongodb://localhost:27017")
         db_name = db_name or os.getenv("MONGODB_DB", "discord_rag")
@@ -46,7 +88,8 @@ class UserTokenImporter:
         self.redis_client = redis.from_url(redis_url, decode_responses=True)
 
     async def close(self):
-        """Close the MongoDB connection."""
+        """Close the Discord API client and the MongoDB connection."""
+        await self.http.aclose()
         self.mongo_client.close()
 
     def _update_stats(self, guild_id: str, channel_id: str, channel_name: str, messages_imported: int, oldest_timestamp: int = None, newest_timestamp: int = None):
@@ -88,34 +131,84 @@ class UserTokenImporter:
             self.redis_client.hincrby(stats_key, "indexed_channels", 1)
 
         self.redis_client.hset(channels_key, channel_id, json.dumps(info))
+        self.redis_client.delete("discord_rag:admin:guilds_cache")
         logger.info(f"Updated stats for guild {guild_id}: +{messages_imported} messages")
 
     async def get_channel_info(self, channel_id: str) -> Optional[Dict[str, Any]]:
         """Get channel information to determine type (DM, Group DM, or Guild)."""
-        logger.info(f"Fetching channel info for {channel_id}")
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{DISCORD_API_BASE}/channels/{channel_id}",
-                headers=self.headers
-            )
+        cache_key = (self._token_fingerprint, channel_id)
+        cached = _channel_info_cache.get(cache_key)
+        if cached:
+            if time.monotonic() - cached[0] < CHANNEL_INFO_TTL_SECONDS:
+                _channel_info_cache.move_to_end(cache_key)
+                return cached[1]
+            del _channel_info_cache[cache_key]
 
-            logger.info(f"Channel info response: {response.status_code}")
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Channel type: {data.get('type')}, name: {data.get('name')}")
-                return data
-            elif response.status_code == 401:
-                logger.error("Invalid user token")
-                raise ValueError("Invalid user token")
-            elif response.status_code == 403:
-                logger.error("No access to this channel")
-                raise ValueError("No access to this channel")
-            elif response.status_code == 404:
-                logger.error("Channel not found")
-                raise ValueError("Channel not found")
-            else:
-                logger.error(f"Discord API error: {response.status_code} - {response.text}")
-                raise ValueError(f"Discord API error: {response.status_code}")
+        logger.info(f"Fetching channel info for {channel_id}")
+        response = await self.http.get(f"/channels/{channel_id}")
+
+        logger.info(f"Channel info response: {response.status_code}")
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            logger.info(f"Channel type: {data.get('type')}, name: {data.get('name')}")
+            _channel_info_cache[cache_key] = (time.monotonic(), data)
+            _channel_info_cache.move_to_end(cache_key)
+            while len(_channel_info_cache) > CHANNEL_INFO_CACHE_SIZE:
+                _channel_info_cache.popitem(last=False)
+            return data
+        elif response.status_code == 401:
+            logger.error("Invalid user token")
+            raise ValueError("Invalid user token")
+        elif response.status_code == 403:
+            logger.error("No access to this channel")
+            raise ValueError("No access to this channel")
+        elif response.status_code == 404:
+            logger.error("Channel not found")
+            raise ValueError("Channel not found")
+        else:
+            logger.error(f"Discord API error: {response.status_code} - {response.text}")
+            raise ValueError(f"Discord API error: {response.status_code}")
+
+    async def _upsert_documents(self, documents: List[Dict[str, Any]]):
+        """Upsert converted messages in bulk, up to one request's worth per write."""
+        for i in range(0, len(documents), MAX_MESSAGES_PER_REQUEST):
+            ops = [
+                UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True)
+                for doc in documents[i:i + MAX_MESSAGES_PER_REQUEST]
+            ]
+            await self.collection.bulk_write(ops, ordered=False)
+
+    async def _insert_documents(self, documents: List[Dict[str, Any]]):
+        """Insert messages expected to be new, upserting any that already exist."""
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            await self._upsert_documents([documents[error["index"]] for error in errors])
+
+    async def _upsert_from_queue(self, queue: asyncio.Queue, cold: bool = False):
+        """Store document batches from the queue until a None sentinel arrives.
+
+        A cold import (nothing stored for the channel yet) inserts instead of
+        upserting, skipping the per-document lookup.
+        """
+        store = self._insert_documents if cold else self._upsert_documents
+        while (documents := await queue.get()) is not None:
+            await store(documents)
+
+    async def _ensure_indexes(self):
+        """Index messages by channel and time, once per collection per process."""
+        namespace = self.collection.full_name
+        if namespace in _indexed_collections:
+            return
+        # Serves the newest-message lookup (reverse scan) and the loader's
+        # (channel.id, timestamp) sort alike
+        await self.collection.create_indexes([
+            IndexModel([("channel.id", 1), ("timestamp", 1)]),
+        ])
+        _indexed_collections.add(namespace)
 
     async def get_latest_stored_message_id(self, channel_id: str) -> Optional[str]:
         """Get the ID of the most recently stored message for this channel."""
@@ -141,24 +234,30 @@ class UserTokenImporter:
 
         logger.info(f"Fetching messages for channel {channel_id} with params: {params}")
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{DISCORD_API_BASE}/channels/{channel_id}/messages",
-                headers=self.headers,
-                params=params
-            )
+        for _ in range(RATE_LIMIT_MAX_RETRIES + 1):
+            # Wait out a bucket the previous response reported as empty
+            delay = self._rate_limit_reset_at - time.monotonic()
+            if delay > 0:
+                logger.info(f"Rate limit bucket exhausted, waiting {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+            response = await self.http.get(f"/channels/{channel_id}/messages", params=params)
 
             logger.info(f"Messages response: {response.status_code}")
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                reset_after = float(response.headers.get("X-RateLimit-Reset-After", 0))
+                self._rate_limit_reset_at = time.monotonic() + reset_after
+
             if response.status_code == 200:
-                messages = response.json()
+                messages = orjson.loads(response.content)
                 logger.info(f"Fetched {len(messages)} messages")
                 return messages
             elif response.status_code == 429:
-                # Rate limited - wait and retry
-                retry_after = response.json().get("retry_after", 5)
+                # Rate limited - wait exactly as long as Discord asks, then retry
+                retry_after = float(response.headers.get("Retry-After") or response.json().get("retry_after", 1))
                 logger.warning(f"Rate limited, waiting {retry_after}s")
                 await asyncio.sleep(retry_after)
-                return await self.fetch_messages(channel_id, after, limit)
+                continue
             elif response.status_code == 401:
                 logger.error("Invalid user token when fetching messages")
                 raise ValueError("Invalid user token")
@@ -169,6 +268,9 @@ class UserTokenImporter:
                 logger.error(f"Discord API error: {response.status_code} - {response.text}")
                 raise ValueError(f"Discord API error: {response.status_code}")
 
+        logger.error(f"Still rate limited after {RATE_LIMIT_MAX_RETRIES} retries")
+        raise ValueError("Discord API rate limit exceeded")
+
     def _build_message_url(self, channel_info: Dict, channel_id: str, message_id: str) -> str:
         """Build the Discord message URL based on channel type."""
         channel_type = channel_info.get("type", 0)
@@ -187,8 +289,7 @@ class UserTokenImporter:
         # Parse timestamp
         timestamp_str = msg.get("timestamp", "")
         try:
-            dt = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
-            timestamp_ms = int(dt.timestamp() * 1000)
+            timestamp_ms = _parse_discord_timestamp(timestamp_str)
         except:
             timestamp_ms = int(datetime.utcnow().timestamp() * 1000)
 
@@ -245,6 +346,7 @@ class UserTokenImporter:
         logger.info(f"Channel type: {channel_type_name}")
 
         # Get last stored message to resume from (for incremental mode)
+        await self._ensure_indexes()
         last_message_id = await self.get_latest_stored_message_id(channel_id)
         logger.info(f"Last stored message ID: {last_message_id}")
 
@@ -262,7 +364,14 @@ class UserTokenImporter:
         use_full_history = full_history or (last_message_id is None)
         logger.info(f"Import mode: {'full_history' if use_full_history else 'incremental'}")
 
-        if use_full_history:
+        # Fetching and storing overlap: converted batches go through a bounded
+        # queue so the next Discord page is requested while MongoDB writes
+        queue = asyncio.Queue(maxsize=UPSERT_QUEUE_SIZE)
+
+        async def produce_full_history():
+            nonlocal messages_imported, messages_skipped, batch_count
+            nonlocal oldest_id, newest_id, oldest_timestamp, newest_timestamp
+
             # FULL HISTORY MODE: Use 'before' to paginate backwards through all messages
             current_before = None  # Start from newest
 
@@ -298,22 +407,15 @@ class UserTokenImporter:
                 logger.info(f"Batch {batch_count}: {len(valid_messages)} valid, {bot_count} bots, {empty_count} empty")
 
                 if valid_messages:
-                    # Convert and store
+                    # Convert and hand off for storage
                     documents = [
                         self._convert_message(msg, channel_info, channel_id)
                         for msg in valid_messages
                     ]
-
-                    # Upsert to avoid duplicates
-                    for doc in documents:
-                        await self.collection.update_one(
-                            {"_id": doc["_id"]},
-                            {"$set": doc},
-                            upsert=True
-                        )
+                    await queue.put(documents)
 
                     messages_imported += len(documents)
-                    logger.info(f"Stored {len(documents)} messages, total imported: {messages_imported}")
+                    logger.info(f"Queued {len(documents)} messages, total imported: {messages_imported}")
 
                     # Track range (documents are newest-first)
                     if newest_id is None:
@@ -333,14 +435,19 @@ class UserTokenImporter:
                 if len(batch) < MAX_MESSAGES_PER_REQUEST:
                     logger.info(f"Batch had {len(batch)} messages (< {MAX_MESSAGES_PER_REQUEST}), ending import")
                     break
-        else:
+
+            await queue.put(None)
+
+        async def produce_incremental():
+            nonlocal messages_imported, messages_skipped, batch_count
+            nonlocal oldest_id, newest_id, oldest_timestamp, newest_timestamp
+
             # INCREMENTAL MODE: Use 'after' to get only new messages since last import
             current_after = last_message_id
-            all_new_messages = []
+            messages_fetched = 0
 
-            # First, collect all new messages
             while True:
-                if max_messages and len(all_new_messages) >= max_messages:
+                if max_messages and messages_fetched >= max_messages:
                     break
 
                 batch = await self.fetch_messages(channel_id, after=current_after)
@@ -350,43 +457,52 @@ class UserTokenImporter:
                 if not batch:
                     break
 
-                all_new_messages.extend(batch)
+                messages_fetched += len(batch)
 
                 # Discord returns newest first, so get the newest ID for next pagination
                 current_after = batch[0]["id"]
 
+                # Batches move forward in time; store each one oldest-first
+                documents = []
+                for msg in reversed(batch):
+                    if msg.get("author", {}).get("bot"):
+                        messages_skipped += 1
+                        continue
+                    if not msg.get("content", "").strip():
+                        messages_skipped += 1
+                        continue
+
+                    documents.append(self._convert_message(msg, channel_info, channel_id))
+
+                if documents:
+                    await queue.put(documents)
+                    messages_imported += len(documents)
+
+                    if oldest_id is None:
+                        oldest_id = documents[0]["_id"]
+                        oldest_timestamp = documents[0]["timestamp"]
+                    newest_id = documents[-1]["_id"]
+                    newest_timestamp = documents[-1]["timestamp"]
+
                 await asyncio.sleep(RATE_LIMIT_DELAY)
 
                 if len(batch) < MAX_MESSAGES_PER_REQUEST:
                     break
 
-            # Process collected messages (reverse to oldest-first for storage)
-            all_new_messages.reverse()
-
-            for msg in all_new_messages:
-                if msg.get("author", {}).get("bot"):
-                    messages_skipped += 1
-                    continue
-                if not msg.get("content", "").strip():
-                    messages_skipped += 1
-                    continue
-
-                doc = self._convert_message(msg, channel_info, channel_id)
-                await self.collection.update_one(
-                    {"_id": doc["_id"]},
-                    {"$set": doc},
-                    upsert=True
-                )
-                messages_imported += 1
-
-                if oldest_id is None:
-                    oldest_id = doc["_id"]
-                    oldest_timestamp = doc["timestamp"]
-                newest_id = doc["_id"]
-                newest_timestamp = doc["timestamp"]
-
+            await queue.put(None)
             logger.info(f"Incremental import complete: {messages_imported} imported, {messages_skipped} skipped")
 
+        producer = asyncio.create_task(
+            produce_full_history() if use_full_history else produce_incremental()
+        )
+        consumer = asyncio.create_task(self._upsert_from_queue(queue, cold=last_message_id is None))
+        try:
+            await asyncio.gather(producer, consumer)
+        finally:
+            # If either side failed, don't leave the other waiting on the queue
+            producer.cancel()
+            consumer.cancel()
+
         logger.info(f"Import complete: {messages_imported} imported, {messages_skipped} skipped")
 
         # Update Redis stats
@@ -178,7 +178,20 @@ async def ingest_guild(
     }
 
     redis_client.set(f"discord_rag:jobs:{job_id}", json.dumps(job_data), ex=86400)
-    redis_client.lpush("discord_rag:ingest_queue", json.dumps(job_data))
+    redis_client.xadd(
+        "discord_rag:ingest_stream",
+        {
+            "job_id": job_id,
+            "type": "ingest",
+            "guild_id": guild_id,
+            "channel_ids": ",".join(request.channel_ids or []),
+            "after": job_data["after"] or "",
+            "limit": str(request.limit) if request.limit else "",
+            "triggered_at": job_data["created_at"],
+        },
+        maxlen=10000,
+        approximate=True
+    )
 
     return IngestResponse(
         status="started",
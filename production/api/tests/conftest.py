@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The API runs from src/api with its modules importable at top level
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "api"))
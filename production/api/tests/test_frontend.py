@@ -0,0 +1,16 @@
+import orjson
+import pytest
+
+pytest.importorskip("fastapi")
+
+from platform_app.frontend import _bootstrap_json
+
+
+def test_bootstrap_json_is_inert_inside_script():
+    data = {"username": "<!--<script>", "title": "</script>&<b>"}
+    encoded = _bootstrap_json(data)
+
+    assert b"<" not in encoded
+    assert b">" not in encoded
+    assert b"&" not in encoded
+    assert orjson.loads(encoded) == data
@@ -6,10 +6,17 @@ const axios = require('axios');
 const config = require('./config.js');
 
 const MAX_FETCH_LIMIT = 100;
-const QUEUE_KEY = 'discord_rag:ingest_queue';
+const DISCORD_EPOCH = 1420070400000n;
+const LEGACY_QUEUE_KEY = 'discord_rag:ingest_queue';
+const STREAM_KEY = 'discord_rag:ingest_stream';
+const STREAM_GROUP = 'scheduler';
+const STREAM_CONSUMER = 'scheduler';
+const JOBS_INDEX_KEY = 'discord_rag:jobs_index';
+const JOBS_INDEX_MAX = 1000;
 const STATUS_KEY = 'discord_rag:bot:status';
 const HEARTBEAT_KEY = 'discord_rag:bot:heartbeat';
 const CHANNEL_IDS_KEY = 'discord_rag:settings:channel_ids';
+const GUILDS_CACHE_KEY = 'discord_rag:admin:guilds_cache';
 
 // Discord client for fetching messages
 const discordClient = new Client({
@@ -148,9 +155,17 @@ async function hasRecentActivity(quietPeriodMinutes) {
 }
 
 /**
- * Fetch and store new messages from Discord
+ * Smallest Discord snowflake for a message sent at the given time
  */
-async function ingestMessages(channelIdFilter = null) {
+function snowflakeFromDate(date) {
+    return ((BigInt(date.getTime()) - DISCORD_EPOCH) << 22n).toString();
+}
+
+/**
+ * Fetch and store new messages from Discord, optionally only those sent
+ * after a given time and up to a total message limit
+ */
+async function ingestMessages(channelIdFilter = null, { after = null, limit = null } = {}) {
     console.log('[Scheduler] Starting message ingestion...');
 
     const channelIds = channelIdFilter
@@ -172,17 +187,28 @@ async function ingestMessages(channelIdFilter = null) {
         let totalProcessed = 0;
 
         for (const channelId of channelIds) {
+            if (limit !== null && totalProcessed >= limit) break;
+
             try {
                 const channel = await discordClient.channels.fetch(channelId);
                 let latestStoredMessageId = await getLatestStoredMessageId(collection, channelId);
+                if (after) {
+                    const afterId = snowflakeFromDate(after);
+                    if (BigInt(afterId) > BigInt(latestStoredMessageId)) {
+                        latestStoredMessageId = afterId;
+                    }
+                }
                 let messagesProcessed = 0;
                 let messagesCollection;
 
                 console.log(`[Scheduler] Ingesting from channel ${channelId}...`);
 
                 do {
+                    const remaining = limit === null ? MAX_FETCH_LIMIT : limit - totalProcessed - messagesProcessed;
+                    if (remaining <= 0) break;
+
                     messagesCollection = await channel.messages.fetch({
-                        limit: MAX_FETCH_LIMIT,
+                        limit: Math.min(MAX_FETCH_LIMIT, remaining),
                         cache: false,
                         after: latestStoredMessageId
                     });
@@ -239,6 +265,11 @@ async function ingestMessages(channelIdFilter = null) {
             }
         }
 
+        // Guild stats changed; drop the admin API's cached guild listing
+        if (redisClient && totalProcessed > 0) {
+            await redisClient.del(GUILDS_CACHE_KEY);
+        }
+
         console.log(`[Scheduler] Ingestion complete. Total: ${totalProcessed} messages`);
         return totalProcessed;
     } finally {
@@ -301,25 +332,37 @@ async function triggerIndexing() {
 }
 
 /**
- * Process manual trigger from Redis queue
+ * Process manual trigger from the Redis ingest stream
  */
 async function processManualTrigger(jobData) {
     console.log(`[Scheduler] Processing manual trigger from ${jobData.triggered_by || 'admin'}`);
 
     const jobId = jobData.job_id;
     const channelId = jobData.channel_id || null;
-
-    // Update job status
+    // Optional bounds; stream fields are strings, empty when unset. The API
+    // sends naive ISO times in UTC, so add the zone JS would otherwise assume local
+    const after = jobData.after
+        ? new Date(/(Z|[+-]\d\d:?\d\d)$/i.test(jobData.after) ? jobData.after : `${jobData.after}Z`)
+        : null;
+    const limit = parseInt(jobData.limit, 10) || null;
+
+    // Update job status and index the job by start time (newest last)
     if (redisClient && jobId) {
-        await redisClient.hSet(`discord_rag:job:${jobId}`, {
+        const jobKey = `discord_rag:job:${jobId}`;
+        await redisClient.hSet(jobKey, {
             status: 'running',
             started_at: new Date().toISOString(),
             triggered_by: jobData.triggered_by || 'admin'
         });
+        await redisClient.zAdd(JOBS_INDEX_KEY, { score: Date.now(), value: jobKey });
+        await redisClient.zRemRangeByRank(JOBS_INDEX_KEY, 0, -(JOBS_INDEX_MAX + 1));
     }
 
     try {
-        const messagesIngested = await ingestMessages(channelId);
+        const messagesIngested = await ingestMessages(channelId, {
+            after: after && !isNaN(after.getTime()) ? after : null,
+            limit
+        });
 
         if (messagesIngested > 0) {
             await triggerIndexing();
@@ -349,22 +392,83 @@ async function processManualTrigger(jobData) {
 }
 
 /**
- * Poll Redis queue for manual triggers
+ * Create the ingest stream consumer group and move over any jobs still
+ * waiting in the old list-based queue
  */
-async function pollQueue() {
+async function initQueue() {
     if (!redisClient) return;
 
     try {
-        // BRPOP with 5 second timeout
-        const result = await redisClient.brPop(QUEUE_KEY, 5);
+        await redisClient.xGroupCreate(STREAM_KEY, STREAM_GROUP, '0', { MKSTREAM: true });
+    } catch (err) {
+        if (!err.message.startsWith('BUSYGROUP')) {
+            console.error('[Scheduler] Failed to create stream group:', err.message);
+        }
+    }
 
-        if (result) {
-            try {
-                const jobData = JSON.parse(result.element);
-                await processManualTrigger(jobData);
-            } catch (err) {
-                console.error('[Scheduler] Failed to parse job data:', err.message);
+    try {
+        let element;
+        while ((element = await redisClient.rPop(LEGACY_QUEUE_KEY))) {
+            const jobData = JSON.parse(element);
+            const fields = {};
+            for (const [key, value] of Object.entries(jobData)) {
+                if (value !== null && value !== undefined) fields[key] = String(value);
             }
+            await redisClient.xAdd(STREAM_KEY, '*', fields);
+        }
+    } catch (err) {
+        console.error('[Scheduler] Failed to migrate queued jobs:', err.message);
+    }
+
+    await backfillJobsIndex();
+}
+
+/**
+ * Add job hashes written before the jobs index existed to the index, scored
+ * by their start time. NX leaves jobs the scheduler already indexed alone.
+ */
+async function backfillJobsIndex() {
+    try {
+        const members = [];
+        for await (const jobKey of redisClient.scanIterator({ MATCH: 'discord_rag:job:*', COUNT: 500 })) {
+            const startedAt = await redisClient.hGet(jobKey, 'started_at');
+            members.push({ score: Date.parse(startedAt) || 0, value: jobKey });
+        }
+        if (members.length === 0) return;
+
+        await redisClient.zAdd(JOBS_INDEX_KEY, members, { NX: true });
+        await redisClient.zRemRangeByRank(JOBS_INDEX_KEY, 0, -(JOBS_INDEX_MAX + 1));
+    } catch (err) {
+        console.error('[Scheduler] Failed to backfill jobs index:', err.message);
+    }
+}
+
+/**
+ * Poll the Redis stream for manual triggers. Jobs are acknowledged once
+ * processed, so anything delivered before a crash is picked up again on
+ * restart (the first read replays this consumer's pending entries).
+ */
+async function pollQueue(streamId = '0') {
+    if (!redisClient) return;
+
+    try {
+        // XREADGROUP with 5 second block
+        const result = await redisClient.xReadGroup(
+            STREAM_GROUP,
+            STREAM_CONSUMER,
+            { key: STREAM_KEY, id: streamId },
+            { COUNT: 1, BLOCK: 5000 }
+        );
+        const entries = result ? result[0].messages : [];
+
+        for (const entry of entries) {
+            await processManualTrigger(entry.message);
+            await redisClient.xAck(STREAM_KEY, STREAM_GROUP, entry.id);
+        }
+
+        // Once the pending backlog is drained, switch to new entries
+        if (streamId === '0' && entries.length === 0) {
+            streamId = '>';
         }
     } catch (err) {
         if (err.message !== 'Connection is closed.') {
@@ -373,7 +477,7 @@ async function pollQueue() {
     }
 
     // Continue polling
-    setImmediate(pollQueue);
+    setImmediate(() => pollQueue(streamId));
 }
 
 /**
@@ -447,6 +551,7 @@ discordClient.once('ready', async () => {
 
     // Start queue polling for manual triggers
     console.log('[Scheduler] Starting queue listener for manual triggers...');
+    await initQueue();
     pollQueue();
 
     // Schedule the cron job